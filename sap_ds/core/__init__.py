@@ -7,6 +7,7 @@ This module provides the foundational classes for connecting to SAP systems:
 - ODataAuth: Authentication configuration (basic or bearer token)
 - ODataConfig: Full connection configuration
 - SAPODataSession: Low-level HTTP session with retry, CSRF handling
+- MemoryCSRFStore / FileCSRFStore: Shared CSRF token caches
 - ConnectionContext: High-level connection manager (hana_ml style)
 
 """
@@ -17,6 +18,7 @@ from sap_ds.core.session import (
     SAPODataSession,
     ODataUpstreamError,
 )
+from sap_ds.core.csrf import CSRFTokenStore, MemoryCSRFStore, FileCSRFStore
 
 from sap_ds.core.connection import ConnectionContext
 
@@ -26,4 +28,7 @@ __all__ = [
     "SAPODataSession",
     "ODataUpstreamError",
     "ConnectionContext",
+    "CSRFTokenStore",
+    "MemoryCSRFStore",
+    "FileCSRFStore",
 ]
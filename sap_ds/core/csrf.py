@@ -0,0 +1,168 @@
+"""
+sap_ds.core.csrf - CSRF token stores
+=====================================
+
+Pluggable caches for SAP Gateway CSRF tokens, so a new process can skip the
+token-fetch round trip before its first write.
+
+SAP binds a CSRF token to the session cookies it was issued with, so
+SAPODataSession stores the token together with those cookies, and re-fetches
+when the server still answers 403 "CSRF token validation failed".
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Protocol, Tuple, Union
+
+
+class CSRFTokenStore(Protocol):
+    """
+    Storage protocol for CSRF tokens.
+
+    Keys are opaque hashes of (base URL, service, sap-client, auth identity);
+    values are opaque strings.
+    """
+
+    def get(self, key: str) -> Optional[str]:
+        ...
+
+    def set(self, key: str, token: str, ttl: float) -> None:
+        ...
+
+    def delete(self, key: str) -> None:
+        ...
+
+
+class MemoryCSRFStore:
+    """
+    In-process CSRF token store with per-entry expiry.
+
+    Share one instance between SAPODataSession objects to reuse tokens
+    across sessions within a process.
+    """
+
+    def __init__(self) -> None:
+        self._data: Dict[str, Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> Dict[str, object]:
+        return {"_data": dict(self._data)}
+
+    def __setstate__(self, state: Dict[str, object]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return None
+            if hit[0] < time.time():
+                del self._data[key]
+                return None
+            return hit[1]
+
+    def set(self, key: str, token: str, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (time.time() + float(ttl), token)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+
+def _expires(entry: object) -> float:
+    """Expiry timestamp of a stored entry; 0 (expired) when malformed."""
+    if not isinstance(entry, dict):
+        return 0.0
+    try:
+        return float(entry.get("expires", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class FileCSRFStore:
+    """
+    JSON-file CSRF token store shared across processes.
+
+    Entries carry SAP session cookies, so the file is written with mode 0600.
+    Writes replace the file atomically; concurrent writers may drop each
+    other's entries, which only costs a token re-fetch.
+
+    Parameters
+    ----------
+    path : str or Path, optional
+        Cache file (default: ~/.cache/odata/csrf.json)
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None) -> None:
+        self.path = Path(path) if path else Path.home() / ".cache" / "odata" / "csrf.json"
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> Dict[str, object]:
+        return {"path": self.path}
+
+    def __setstate__(self, state: Dict[str, object]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict[str, object]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _save(self, data: Dict[str, Dict[str, object]]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Unique temp file per writer (mkstemp creates it 0600), so concurrent
+        # processes never interleave writes into one file before the replace
+        fd, tmp = tempfile.mkstemp(
+            dir=self.path.parent, prefix=f"{self.path.name}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp)
+            raise
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._load().get(key)
+        if _expires(entry) < time.time():
+            return None
+        token = entry.get("token")
+        return token if isinstance(token, str) else None
+
+    def set(self, key: str, token: str, ttl: float) -> None:
+        now = time.time()
+        with self._lock:
+            data = {
+                k: v for k, v in self._load().items()
+                if _expires(v) >= now
+            }
+            data[key] = {"token": token, "expires": now + float(ttl)}
+            try:
+                self._save(data)
+            except OSError:
+                pass
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            data = self._load()
+            if data.pop(key, None) is not None:
+                try:
+                    self._save(data)
+                except OSError:
+                    pass
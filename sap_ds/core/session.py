@@ -5,6 +5,7 @@ sap_ds.core.session - SAP OData HTTP Session Management
 Low-level session handling for SAP OData services with:
 - Basic and Bearer token authentication
 - Automatic retry with exponential backoff
+- gzip/deflate response compression
 - CSRF token handling for write operations
 - sap-client injection
 - Proper error extraction from SAP responses
@@ -13,17 +14,217 @@ Low-level session handling for SAP OData services with:
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any, Dict, Optional, Tuple, Union
+from email.parser import BytesParser
+from typing import (
+    Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union,
+)
+from urllib.parse import quote, urlencode
+import hashlib
+import itertools
 import json
 import logging
+import os
+import socket
 import threading
 import time
+import uuid
+import weakref
 
 import requests
 from requests import Response, Session
 from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
 from urllib3.util.retry import Retry
 
+from sap_ds.core.csrf import CSRFTokenStore
+from sap_ds.core.transport import HttpxSession
+
+# Optional: incremental JSON parsing of large responses
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Optional: C JSON codec for request and response bodies
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _dumps(obj: Any) -> bytes:
+    """Serialize a request payload to compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def _loads_bytes(data: bytes) -> Any:
+    """Parse a UTF-8 JSON document."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _decode_json(r: Response) -> Any:
+    """
+    Decode a JSON response body.
+
+    Parses the buffered bytes with orjson when available; bodies it rejects
+    (e.g. non-UTF-8 charsets, or a content object that is not bytes) fall
+    back to ``Response.json()``.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(r.content)
+        except (orjson.JSONDecodeError, TypeError):
+            pass
+    return r.json()
+
+
+logger = logging.getLogger("sap_ds.odata")
+
+_XML_ACCEPT = {"Accept": "application/xml"}
+
+# Characters left unescaped in $batch sub-request query strings
+_QUERY_SAFE = "$,'()*:"
+
+# Labels for the SAP error fields reported by _extract_sap_error
+_ERROR_PART_KEYS = ("code", "message", "txid", "ts")
+_join_error_parts = " | ".join
+
+_WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "MERGE", "DELETE"})
+
+
+class _ODataRetry(Retry):
+    """
+    Retry policy that keeps writes from being replayed blindly.
+
+    Reads follow the configured status_forcelist. Writes are retried at most
+    once and only on 429/503, where the gateway rejected the request before
+    processing it; they are not in allowed_methods, so read errors after a
+    write was sent are never retried either.
+    """
+
+    WRITE_STATUS_FORCELIST = frozenset({429, 503})
+
+    def is_retry(self, method: str, status_code: int, has_retry_after: bool = False) -> bool:
+        if method.upper() in _WRITE_METHODS:
+            return (
+                status_code in self.WRITE_STATUS_FORCELIST
+                and not self.history
+                and bool(self.total)
+            )
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+# Top-level key -> ijson prefix of the records it holds (OData v2 / v4)
+_STREAM_ROW_PREFIXES = {"d": "d.results.item", "value": "value.item"}
+
+
+def _iter_stream_rows(
+    r: Response, fallback: Callable[[], Iterable[Dict[str, Any]]]
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield records parsed incrementally from a streamed response.
+    
+    Reads OData v2 ``d.results`` or v4 ``value`` arrays, whichever top-level
+    key comes first. A body without either, or one that fails to parse before
+    any record was yielded, is re-read with `fallback` (a buffered get()).
+    Once records have been yielded a parse error means a truncated or corrupt
+    page and raises ODataUpstreamError rather than returning a partial result.
+    """
+    n = 0
+    try:
+        events = ijson.parse(r.raw, use_float=True)
+        prefix = None
+        for path, event, value in events:
+            if path == "" and event == "map_key" and value in _STREAM_ROW_PREFIXES:
+                prefix = _STREAM_ROW_PREFIXES[value]
+                break
+        if prefix is not None:
+            for row in ijson.items(events, prefix):
+                n += 1
+                yield row
+            return
+        logger.debug("No d.results or value array in %s, re-reading buffered", r.url)
+    except ijson.JSONError as e:
+        if n:
+            logger.warning("Stream parse failed after %d rows from %s: %s", n, r.url, e)
+            raise ODataUpstreamError(
+                r.status_code,
+                f"Invalid or truncated JSON after {n} rows: {e}",
+                r.url,
+                dict(r.headers),
+            ) from e
+        logger.debug("Stream parse failed for %s, re-reading buffered: %s", r.url, e)
+    finally:
+        r.close()
+    yield from fallback()
+
+
+class _TunedAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose pooled sockets use TCP keepalive.
+
+    urllib3 already sets TCP_NODELAY by default; keepalive lets the OS
+    detect connections silently dropped by NAT/firewalls instead of
+    hanging until the read timeout.
+    """
+
+    SOCKET_OPTIONS = HTTPConnection.default_socket_options + [
+        (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+    ]
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        kwargs.setdefault("socket_options", self.SOCKET_OPTIONS)
+        super().init_poolmanager(*args, **kwargs)
+
+
+def _parse_batch_response(r: Response) -> List[Tuple[int, str, bytes]]:
+    """
+    Split a multipart/mixed $batch response into its sub-responses.
+
+    Returns (status, content type, body) per part, in order; parts of a
+    changeset are flattened in place.
+    """
+    ctype = r.headers.get("Content-Type") or ""
+    msg = BytesParser().parsebytes(
+        b"Content-Type: " + ctype.encode("latin-1") + b"\r\n\r\n" + r.content
+    )
+    if not msg.is_multipart():
+        return []
+
+    out: List[Tuple[int, str, bytes]] = []
+    for part in msg.get_payload():
+        for sub in (part.get_payload() if part.is_multipart() else [part]):
+            raw = sub.get_payload(decode=True) or b""
+            sep = b"\r\n\r\n" if b"\r\n\r\n" in raw else b"\n\n"
+            head, _, body = raw.partition(sep)
+            lines = head.decode("latin-1").splitlines()
+            status = int(lines[0].split()[1]) if lines else 0
+            sub_ctype = ""
+            for line in lines[1:]:
+                name, _, value = line.partition(":")
+                if name.strip().lower() == "content-type":
+                    sub_ctype = value.strip()
+            out.append((status, sub_ctype, body))
+    return out
+
+
+# Sessions to rebuild in a forked child, which must not share the parent's
+# pooled sockets
+_LIVE_SESSIONS: "weakref.WeakSet[SAPODataSession]" = weakref.WeakSet()
+
+
+def _reset_sessions_after_fork() -> None:
+    for sess in list(_LIVE_SESSIONS):
+        sess._reset_connection_state()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_sessions_after_fork)
+
 
 class ODataUpstreamError(RuntimeError):
     """
@@ -103,6 +304,24 @@ class ODataConfig:
         SSL verification (True, False, or path to CA bundle)
     user_agent : str
         User-Agent header value
+    pool_connections : int
+        Number of per-host connection pools to cache (default: 20)
+    pool_maxsize : int
+        Max pooled keep-alive connections per host (default: 100); size to
+        the number of threads issuing requests concurrently
+    csrf_store : CSRFTokenStore, optional
+        Shared CSRF token cache (e.g. FileCSRFStore) so new sessions and
+        processes can skip the token fetch before their first write
+    csrf_ttl : float
+        Seconds a stored CSRF token is reused (default: 1500, below the
+        usual 30 minute SAP session timeout)
+    transport : str
+        "requests" (default) or "httpx" for HTTP/2 multiplexing; needs
+        ``httpx[http2]`` and retries connection failures only
+    session_shards : int
+        Number of requests.Session objects (each with its own pools of
+        ``pool_maxsize``) that threads are spread across, to reduce pool
+        lock contention under heavy threading (default: 1; ignored for httpx)
         
     Examples
     --------
@@ -121,6 +340,12 @@ class ODataConfig:
     backoff: float = 0.5
     verify: Union[bool, str] = True
     user_agent: str = "sap-ds-sdk/0.1"
+    pool_connections: int = 20
+    pool_maxsize: int = 100
+    csrf_store: Optional[CSRFTokenStore] = None
+    csrf_ttl: float = 1500.0
+    transport: str = "requests"
+    session_shards: int = 1
 
 
 class SAPODataSession:
@@ -130,6 +355,10 @@ class SAPODataSession:
     Handles authentication, retries, CSRF tokens, and sap-client injection.
     Use as a context manager for automatic cleanup.
     
+    Sessions can be pickled (e.g. sent to multiprocessing workers) and
+    survive fork(); either way the copy opens its own connections and
+    re-fetches CSRF tokens on its first write.
+    
     Parameters
     ----------
     cfg : ODataConfig
@@ -147,19 +376,71 @@ class SAPODataSession:
         self.base = cfg.base_url.rstrip("/") + "/"
         self.timeout = float(cfg.timeout)
         self.verify = cfg.verify
-        self.logger = logging.getLogger("sap_ds.odata")
+        self.logger = logger
+
+        # Default params depend only on cfg; build them once and share them
+        # read-only between requests. Default headers live on self.session
+        # and are merged in by requests, so calls only pass deltas.
+        client = cfg.default_sap_client
+        self._client_params: Dict[str, str] = {"sap-client": str(client)} if client else {}
+        self._default_params: Dict[str, str] = {"$format": "json", **self._client_params}
 
-        self.session = self._build_session()
+        # service name -> "<base><service>/" URL prefix
+        self._service_bases: Dict[str, str] = {}
 
+        self._reset_connection_state()
+        _LIVE_SESSIONS.add(self)
+
+    def _reset_connection_state(self) -> None:
+        """(Re)create the HTTP session(s) and the CSRF state bound to them."""
+        n = max(1, int(self.cfg.session_shards)) if self.cfg.transport == "requests" else 1
+        sessions = [self._build_session() for _ in range(n)]
+        for extra in sessions[1:]:
+            # CSRF tokens are bound to the SAP session cookie; share one jar
+            extra.cookies = sessions[0].cookies
+        self._sessions: List[Union[Session, HttpxSession]] = sessions
+        # Threads are assigned shards round-robin on first use
+        self._shard_local = threading.local()
+        self._shard_counter = itertools.count()
         self._csrf_tokens: Dict[str, str] = {}
-        self._csrf_lock = threading.Lock()
+        # one lock per service so unrelated first writes don't serialize
+        self._lock_factory_lock = threading.Lock()
+        self._service_locks: Dict[str, threading.Lock] = {}
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Sockets and locks don't pickle; CSRF tokens are bound to the
+        # session cookies, so they are re-fetched on the first write.
+        state = self.__dict__.copy()
+        for k in (
+            "_sessions", "_shard_local", "_shard_counter",
+            "_csrf_tokens", "_lock_factory_lock", "_service_locks",
+        ):
+            state.pop(k, None)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._reset_connection_state()
+        _LIVE_SESSIONS.add(self)
+
+    @property
+    def session(self) -> Union[Session, HttpxSession]:
+        """HTTP session for the calling thread (one of ``cfg.session_shards``)."""
+        sessions = self._sessions
+        if len(sessions) == 1:
+            return sessions[0]
+        idx = getattr(self._shard_local, "idx", None)
+        if idx is None:
+            idx = self._shard_local.idx = next(self._shard_counter) % len(sessions)
+        return sessions[idx]
 
     def close(self) -> None:
-        """Close the underlying HTTP session."""
-        try:
-            self.session.close()
-        except Exception:
-            pass
+        """Close the underlying HTTP session(s)."""
+        for sess in self._sessions:
+            try:
+                sess.close()
+            except Exception:
+                pass
 
     def __enter__(self) -> "SAPODataSession":
         return self
@@ -169,8 +450,18 @@ class SAPODataSession:
 
     # ---------------- auth/session ----------------
 
-    def _build_session(self) -> Session:
-        sess = requests.Session()
+    def _build_session(self) -> Union[Session, HttpxSession]:
+        if self.cfg.transport == "requests":
+            sess = requests.Session()
+        elif self.cfg.transport == "httpx":
+            sess = HttpxSession(
+                timeout=self.timeout,
+                verify=self.verify,
+                max_connections=self.cfg.pool_maxsize,
+                retries=self.cfg.retries,
+            )
+        else:
+            raise ValueError("transport must be 'requests' or 'httpx'")
 
         # auth
         if self.cfg.auth.kind == "basic":
@@ -189,14 +480,28 @@ class SAPODataSession:
             "User-Agent": self.cfg.user_agent,
         })
 
-        retry = Retry(
+        if isinstance(sess, HttpxSession):
+            return sess
+
+        retry_kw: Dict[str, Any] = dict(
             total=self.cfg.retries,
             backoff_factor=self.cfg.backoff,
             status_forcelist=(429, 500, 502, 503, 504),
-            allowed_methods=frozenset({"GET", "HEAD", "OPTIONS", "POST", "PUT", "PATCH", "DELETE"}),
+            allowed_methods=frozenset({"GET", "HEAD", "OPTIONS"}),
+            respect_retry_after_header=True,
             raise_on_status=False,
         )
-        adapter = HTTPAdapter(max_retries=retry, pool_connections=20, pool_maxsize=50)
+        try:
+            retry = _ODataRetry(**retry_kw, backoff_jitter=self.cfg.backoff * 0.5)
+        except TypeError:
+            # urllib3 < 2 has no backoff_jitter
+            retry = _ODataRetry(**retry_kw)
+        adapter = _TunedAdapter(
+            max_retries=retry,
+            pool_connections=self.cfg.pool_connections,
+            pool_maxsize=self.cfg.pool_maxsize,
+            pool_block=False,
+        )
         sess.mount("https://", adapter)
         sess.mount("http://", adapter)
         return sess
@@ -211,32 +516,38 @@ class SAPODataSession:
         include_format: bool = True,
         include_client: bool = True,
     ) -> Dict[str, str]:
-        p: Dict[str, str] = {}
-        if include_format:
-            p["$format"] = "json"
-        if include_client:
-            client = sap_client if sap_client is not None else self.cfg.default_sap_client
-            if client:
-                p["sap-client"] = str(client)
+        # The returned dict may be shared; callers must not mutate it.
+        if include_client and sap_client is None:
+            p = self._default_params if include_format else self._client_params
+        else:
+            p = {"$format": "json"} if include_format else {}
+            if include_client and sap_client:
+                p["sap-client"] = str(sap_client)
         if params:
-            p.update(params)
+            return {**p, **params}
         return p
 
+    def _service_base(self, service: str) -> str:
+        base = self._service_bases.get(service)
+        if base is None:
+            base = self._service_bases[service] = f"{self.base}{service.strip('/')}/"
+        return base
+
     def _url(self, service: str, path: str) -> str:
-        return f"{self.base}{service.strip('/')}/{path.lstrip('/')}"
+        return self._service_base(service) + path.lstrip("/")
 
     def _json_or_text(self, r: Response) -> Dict[str, Any]:
         ctype = (r.headers.get("Content-Type") or "").lower()
         if "json" in ctype:
             try:
-                return r.json()
+                return _decode_json(r)
             except Exception:
                 pass
         return {"raw": r.text, "content_type": r.headers.get("Content-Type", "")}
 
     def _extract_sap_error(self, r: Response) -> str:
         try:
-            data = r.json()
+            data = _decode_json(r)
         except Exception:
             return r.text
         if not isinstance(data, dict):
@@ -245,27 +556,20 @@ class SAPODataSession:
         if not isinstance(err, dict):
             return r.text
 
-        code = err.get("code")
-        message = None
-        if isinstance(err.get("message"), dict):
-            message = err["message"].get("value")
-        elif isinstance(err.get("message"), str):
-            message = err.get("message")
+        message = err.get("message")
+        if isinstance(message, dict):
+            message = message.get("value")
+        elif not isinstance(message, str):
+            message = None
 
         inner = err.get("innererror") or err.get("innerError")
-        txid = inner.get("transactionid") if isinstance(inner, dict) else None
-        ts = inner.get("timestamp") if isinstance(inner, dict) else None
-
-        parts = []
-        if code:
-            parts.append(f"code={code}")
-        if message:
-            parts.append(f"message={message}")
-        if txid:
-            parts.append(f"txid={txid}")
-        if ts:
-            parts.append(f"ts={ts}")
-        return " | ".join(parts) or r.text
+        if not isinstance(inner, dict):
+            inner = {}
+
+        values = (err.get("code"), message, inner.get("transactionid"), inner.get("timestamp"))
+        return _join_error_parts(
+            [f"{k}={v}" for k, v in zip(_ERROR_PART_KEYS, values) if v]
+        ) or r.text
 
     def _raise_for_error(self, r: Response, url: str) -> None:
         if r.status_code >= 400 or r.status_code in (301, 302, 303, 307, 308):
@@ -278,10 +582,12 @@ class SAPODataSession:
         url: str,
         *,
         params: Optional[Dict[str, str]],
-        headers: Dict[str, str],
+        headers: Optional[Dict[str, str]] = None,
         data: Optional[Union[str, bytes]] = None,
+        stream: bool = False,
     ) -> Response:
-        t0 = time.perf_counter()
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+        t0 = time.perf_counter() if debug else 0.0
         r = self.session.request(
             method=method,
             url=url,
@@ -290,10 +596,15 @@ class SAPODataSession:
             data=data,
             timeout=self.timeout,
             verify=self.verify,
+            stream=stream,
         )
         self._raise_for_error(r, url)
-        dt = (time.perf_counter() - t0) * 1000.0
-        self.logger.debug("%s %s %sms", method.upper(), url, round(dt, 1))
+        if debug:
+            self.logger.debug(
+                "%s %s %.1fms encoding=%s",
+                method.upper(), url, (time.perf_counter() - t0) * 1000.0,
+                r.headers.get("Content-Encoding") or "identity",
+            )
         return r
 
     # ---------------- public ops ----------------
@@ -329,13 +640,11 @@ class SAPODataSession:
             Parsed JSON response
         """
         url = self._url(service, path)
-        headers = dict(self.session.headers)
-        if extra_headers:
-            headers.update(extra_headers)
+        headers = extra_headers or None
 
         is_metadata = path.strip().lower() == "$metadata"
         if is_metadata:
-            headers["Accept"] = "application/xml"
+            headers = {**(headers or {}), **_XML_ACCEPT}
 
         if is_metadata:
             q = self._params(params, sap_client, include_format=False, include_client=True)
@@ -357,44 +666,248 @@ class SAPODataSession:
         """
         Execute a GET request and return raw text response.
         
-        Useful for $metadata which returns XML.
+        Useful for $metadata which returns XML. See get_text_conditional()
+        for revalidating a document the caller already holds.
         """
         url = self._url(service, path)
-        headers = dict(self.session.headers)
         
         # For $metadata, accept XML instead of JSON
         if path == "$metadata" or path.endswith("/$metadata"):
-            headers["Accept"] = "application/xml"
+            headers = _XML_ACCEPT
+        else:
+            headers = None
         
         if extra_headers:
-            headers.update(extra_headers)
+            headers = {**(headers or {}), **extra_headers}
 
         q = self._params(params, sap_client, include_format=False, include_client=True)
 
         r = self._request("GET", url, params=q, headers=headers)
         return r.text
 
-    def _ensure_csrf(self, service: str, *, sap_client: Optional[str] = None) -> None:
+    def get_text_conditional(
+        self,
+        service: str,
+        path: str,
+        *,
+        sap_client: Optional[str] = None,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> Tuple[Optional[str], Mapping[str, str]]:
+        """
+        Conditional GET returning raw text, for revalidating cached documents.
+
+        Sends If-None-Match / If-Modified-Since when validators are given.
+
+        Returns
+        -------
+        tuple of (str or None, mapping)
+            (body, case-insensitive response headers); body is None on
+            304 Not Modified
+        """
+        url = self._url(service, path)
+        if path == "$metadata" or path.endswith("/$metadata"):
+            headers = dict(_XML_ACCEPT)
+        else:
+            headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        q = self._params(None, sap_client, include_format=False, include_client=True)
+
+        r = self._request("GET", url, params=q, headers=headers)
+        if r.status_code == 304:
+            return None, r.headers
+        return r.text, r.headers
+
+    def get_stream(
+        self,
+        service: str,
+        path: str,
+        params: Optional[Dict[str, str]] = None,
+        *,
+        sap_client: Optional[str] = None,
+    ) -> Response:
+        """
+        Execute a GET request without reading the response body.
+        
+        The body can be consumed incrementally from ``response.raw``
+        (transparently decompressed). The caller must close the response.
+        """
+        url = self._url(service, path)
+        q = self._params(params, sap_client, include_format=True, include_client=True)
+
+        r = self._request("GET", url, params=q, stream=True)
+        r.raw.decode_content = True
+        return r
+
+    def iter_get(
+        self,
+        service: str,
+        path: str,
+        params: Optional[Dict[str, str]] = None,
+        *,
+        sap_client: Optional[str] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Execute a GET request and iterate over the returned records.
+        
+        With ``ijson`` installed the body is parsed straight off the socket,
+        so peak memory stays near one record instead of the whole page.
+        Without it this falls back to get(). The request itself is sent
+        immediately, so upstream errors are raised by this call; a page that
+        breaks off mid-stream raises ODataUpstreamError while iterating.
+        
+        Returns
+        -------
+        iterator of dict
+            Entity records (OData v2 ``d.results`` or v4 ``value``)
+        """
+        def fallback() -> List[Dict[str, Any]]:
+            payload = self.get(service, path, params, sap_client=sap_client)
+            return payload.get("d", {}).get("results") or payload.get("value") or []
+            
+        if ijson is None:
+            return iter(fallback())
+            
+        # Issue the request eagerly so HTTP errors surface here, not mid-iteration
+        r = self.get_stream(service, path, params, sap_client=sap_client)
+        return _iter_stream_rows(r, fallback)
+
+    def _auth_id(self) -> str:
+        """Stable identity of the configured credentials (user or token hash)."""
+        auth = self.cfg.auth
+        if auth.kind == "bearer":
+            return hashlib.sha256(str(auth.value).encode()).hexdigest()
+        return str(auth.value[0])
+
+    def _csrf_store_key(self, service: str, sap_client: Optional[str]) -> str:
+        client = sap_client or self.cfg.default_sap_client or ""
+        raw = f"{self.base}|{service}|{client}|{self._auth_id()}"
+        return hashlib.blake2b(raw.encode(), digest_size=20).hexdigest()
+
+    def _load_stored_csrf(self, service: str, sap_client: Optional[str]) -> Optional[str]:
+        store = self.cfg.csrf_store
+        if store is None:
+            return None
+        # Unreadable or malformed store contents are a cache miss
+        try:
+            entry = json.loads(store.get(self._csrf_store_key(service, sap_client)) or "null")
+        except (OSError, TypeError, ValueError):
+            return None
+        if not isinstance(entry, dict) or not entry.get("token"):
+            return None
+        cookies = entry.get("cookies")
+        # The token is only valid together with the session it was issued to
+        for c in cookies if isinstance(cookies, list) else []:
+            if not isinstance(c, dict) or not c.get("name") or c.get("value") is None:
+                continue
+            self.session.cookies.set(
+                str(c["name"]), str(c["value"]),
+                domain=str(c.get("domain") or ""), path=str(c.get("path") or "/"),
+            )
+        return str(entry["token"])
+
+    def _save_stored_csrf(self, service: str, sap_client: Optional[str], token: str) -> None:
+        store = self.cfg.csrf_store
+        if store is None:
+            return
+        cookies = [
+            {"name": c.name, "value": c.value, "domain": c.domain, "path": c.path}
+            for c in self.session.cookies
+        ]
+        store.set(
+            self._csrf_store_key(service, sap_client),
+            json.dumps({"token": token, "cookies": cookies}),
+            self.cfg.csrf_ttl,
+        )
+
+    def _invalidate_csrf(self, service: str, *, sap_client: Optional[str] = None) -> None:
+        key = f"{service}::{sap_client or self.cfg.default_sap_client or ''}"
+        self._csrf_tokens.pop(key, None)
+        if self.cfg.csrf_store is not None:
+            self.cfg.csrf_store.delete(self._csrf_store_key(service, sap_client))
+
+    @staticmethod
+    def _csrf_rejected(e: ODataUpstreamError) -> bool:
+        if e.status != 403:
+            return False
+        return any(
+            k.lower() == "x-csrf-token" and str(v).lower() == "required"
+            for k, v in e.headers.items()
+        )
+
+    def _fetch_csrf(
+        self,
+        service: str,
+        sap_client: Optional[str],
+        entity_set: Optional[str] = None,
+    ) -> str:
+        """
+        Fetch a CSRF token with the cheapest request the gateway answers.
+        
+        Tries a HEAD on the service root, then an empty ($top=0) read of
+        ``entity_set``, and only as a last resort the full $metadata document.
+        """
+        headers = {"X-CSRF-Token": "Fetch"}
+        q = self._params({}, sap_client, include_format=False, include_client=True)
+        
+        attempts = [("HEAD", self._url(service, ""), q)]
+        if entity_set:
+            attempts.append(("GET", self._url(service, entity_set), {**q, "$top": "0", "$format": "json"}))
+        
+        for method, url, params in attempts:
+            try:
+                r = self.session.request(
+                    method=method,
+                    url=url,
+                    params=params,
+                    headers=headers,
+                    timeout=self.timeout,
+                    verify=self.verify,
+                )
+            except requests.RequestException as e:
+                self.logger.debug("CSRF fetch via %s %s failed: %s", method, url, e)
+                continue
+            token = r.headers.get("x-csrf-token")
+            if r.status_code < 400 and token and token.lower() != "required":
+                return token
+        
+        url = self._url(service, "$metadata")
+        r = self._request("GET", url, params=q, headers=headers)
+        token = r.headers.get("x-csrf-token")
+        if not token:
+            raise ODataUpstreamError(400, "Failed to obtain CSRF token", url, dict(r.headers))
+        return token
+
+    def _ensure_csrf(
+        self,
+        service: str,
+        *,
+        sap_client: Optional[str] = None,
+        entity_set: Optional[str] = None,
+    ) -> None:
         key = f"{service}::{sap_client or self.cfg.default_sap_client or ''}"
         if key in self._csrf_tokens:
             return
 
-        with self._csrf_lock:
+        with self._lock_factory_lock:
+            lock = self._service_locks.setdefault(key, threading.Lock())
+
+        with lock:
             if key in self._csrf_tokens:
                 return
 
-            url = self._url(service, "$metadata")
-            headers = dict(self.session.headers)
-            headers["X-CSRF-Token"] = "Fetch"
-
-            q = self._params({}, sap_client, include_format=False, include_client=True)
-
-            r = self._request("GET", url, params=q, headers=headers)
-            token = r.headers.get("x-csrf-token")
-            if not token:
-                raise ODataUpstreamError(400, "Failed to obtain CSRF token", url, dict(r.headers))
+            stored = self._load_stored_csrf(service, sap_client)
+            if stored:
+                self._csrf_tokens[key] = stored
+                return
 
+            token = self._fetch_csrf(service, sap_client, entity_set)
             self._csrf_tokens[key] = token
+            self._save_stored_csrf(service, sap_client, token)
 
     def post(
         self,
@@ -407,23 +920,128 @@ class SAPODataSession:
         """
         Execute a POST (create) request against an entity set.
         
-        Automatically handles CSRF token fetching.
+        Automatically handles CSRF token fetching. A token rejected by the
+        server (expired, or a stored token whose session has ended) is
+        re-fetched and the request retried once.
         """
-        self._ensure_csrf(service, sap_client=sap_client)
-        url = self._url(service, entity_set)
-        key = f"{service}::{sap_client or self.cfg.default_sap_client or ''}"
-        headers = {
-            "X-CSRF-Token": self._csrf_tokens[key],
-            "Content-Type": "application/json"
-        }
-        r = self._request(
-            "POST",
-            url,
+        r = self._post_with_csrf(
+            service,
+            entity_set,
             params=self._params({}, sap_client),
-            headers=headers,
-            data=json.dumps(payload, separators=(",", ":"))
+            data=_dumps(payload),
+            content_type="application/json",
+            sap_client=sap_client,
+            entity_set=entity_set,
         )
         try:
-            return r.json()
+            return _decode_json(r)
         except Exception:
             return {"location": r.headers.get("Location"), "etag": r.headers.get("ETag")}
+
+    def _post_with_csrf(
+        self,
+        service: str,
+        path: str,
+        *,
+        params: Dict[str, str],
+        data: bytes,
+        content_type: str,
+        sap_client: Optional[str] = None,
+        entity_set: Optional[str] = None,
+    ) -> Response:
+        """POST with a CSRF token, re-fetching it once if the server rejects it."""
+        url = self._url(service, path)
+        key = f"{service}::{sap_client or self.cfg.default_sap_client or ''}"
+        
+        def send() -> Response:
+            self._ensure_csrf(service, sap_client=sap_client, entity_set=entity_set)
+            headers = {
+                "X-CSRF-Token": self._csrf_tokens[key],
+                "Content-Type": content_type,
+            }
+            return self._request("POST", url, params=params, headers=headers, data=data)
+        
+        try:
+            return send()
+        except ODataUpstreamError as e:
+            if not self._csrf_rejected(e):
+                raise
+            self._invalidate_csrf(service, sap_client=sap_client)
+        return send()
+
+    def batch_get(
+        self,
+        reads: Sequence[Tuple[str, str, Optional[Dict[str, str]]]],
+        *,
+        sap_client: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Execute several GET requests through OData ``$batch``.
+        
+        Requests to the same service share one multipart/mixed POST, so N
+        reads cost one round trip per service instead of N.
+        
+        Parameters
+        ----------
+        reads : sequence of (service, path, params)
+            Sub-requests; ``params`` may be None
+        sap_client : str, optional
+            Override default sap-client
+            
+        Returns
+        -------
+        list of dict
+            Parsed JSON per sub-request, in input order
+            
+        Raises
+        ------
+        ODataUpstreamError
+            If the batch or any sub-request fails
+        """
+        by_service: Dict[str, List[int]] = {}
+        for i, (service, _, _) in enumerate(reads):
+            by_service.setdefault(service, []).append(i)
+        
+        out: List[Dict[str, Any]] = [{} for _ in reads]
+        for service, idxs in by_service.items():
+            boundary = f"batch_{uuid.uuid4().hex}"
+            parts = []
+            for i in idxs:
+                _, path, params = reads[i]
+                q = self._params(params, None, include_format=True, include_client=False)
+                parts.append(
+                    f"--{boundary}\r\n"
+                    "Content-Type: application/http\r\n"
+                    "Content-Transfer-Encoding: binary\r\n"
+                    "\r\n"
+                    f"GET {path.lstrip('/')}?{urlencode(q, quote_via=quote, safe=_QUERY_SAFE)} HTTP/1.1\r\n"
+                    "Accept: application/json\r\n"
+                    "\r\n"
+                )
+            body = ("\r\n".join(parts) + f"\r\n--{boundary}--\r\n").encode("utf-8")
+            
+            r = self._post_with_csrf(
+                service,
+                "$batch",
+                params=self._params({}, sap_client, include_format=False),
+                data=body,
+                content_type=f"multipart/mixed; boundary={boundary}",
+                sap_client=sap_client,
+            )
+            results = _parse_batch_response(r)
+            if len(results) != len(idxs):
+                raise ODataUpstreamError(
+                    502,
+                    f"$batch returned {len(results)} parts for {len(idxs)} requests",
+                    self._url(service, "$batch"),
+                    dict(r.headers),
+                )
+            for i, (status, ctype, payload) in zip(idxs, results):
+                url = self._url(service, reads[i][1])
+                if status >= 400:
+                    raise ODataUpstreamError(status, payload.decode("utf-8", "replace"), url, {})
+                if "json" in ctype.lower():
+                    out[i] = _loads_bytes(payload)
+                else:
+                    out[i] = {"raw": payload.decode("utf-8", "replace"), "content_type": ctype}
+        return out
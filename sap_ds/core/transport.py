@@ -0,0 +1,178 @@
+"""
+sap_ds.core.transport - Optional HTTP/2 transport
+==================================================
+
+A requests.Session-compatible facade over ``httpx.Client(http2=True)``, used
+by SAPODataSession when ``ODataConfig(transport="httpx")``. Concurrent
+requests (prefetched pages, parallel chunk reads) are multiplexed over one
+TLS connection instead of one pooled HTTP/1.1 connection each.
+
+Requires ``pip install httpx[http2]``. Only the subset of the requests API
+that SAPODataSession and ODataService use is provided.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterator, Optional, Union
+
+import requests
+from requests.cookies import RequestsCookieJar
+
+# Optional: HTTP/2 client
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+class _StreamReader:
+    """Minimal file-like ``read(n)`` view over a streamed httpx response."""
+
+    def __init__(self, resp: "httpx.Response") -> None:
+        self._chunks: Iterator[bytes] = resp.iter_bytes()
+        self._buf = b""
+        # httpx always decodes Content-Encoding; kept for requests parity
+        self.decode_content = True
+
+    def read(self, n: int = -1) -> bytes:
+        if n is None or n < 0:
+            data = self._buf + b"".join(self._chunks)
+            self._buf = b""
+            return data
+        while len(self._buf) < n:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buf += chunk
+        data, self._buf = self._buf[:n], self._buf[n:]
+        return data
+
+
+class HttpxResponse:
+    """
+    requests.Response-like wrapper around an httpx.Response.
+
+    Streamed bodies are exposed as ``raw``; ``content``/``text``/``json()``
+    read the remaining body on first access.
+    """
+
+    def __init__(self, resp: "httpx.Response", *, stream: bool = False) -> None:
+        self._resp = resp
+        self.status_code = resp.status_code
+        self.headers = resp.headers  # case-insensitive, like requests
+        self.url = str(resp.url)
+        self.raw = _StreamReader(resp) if stream else None
+
+    @property
+    def content(self) -> bytes:
+        return self._resp.read()
+
+    @property
+    def text(self) -> str:
+        self._resp.read()
+        return self._resp.text
+
+    def json(self, **kwargs: Any) -> Any:
+        self._resp.read()
+        return self._resp.json(**kwargs)
+
+    def close(self) -> None:
+        self._resp.close()
+
+
+class HttpxSession:
+    """
+    requests.Session-like facade over an HTTP/2 ``httpx.Client``.
+
+    Transport errors are re-raised as the matching ``requests`` exceptions so
+    callers keep a single error surface. Retries cover connection failures
+    only (httpx has no status-based retry policy).
+
+    Parameters
+    ----------
+    timeout : float
+        Default request timeout in seconds
+    verify : bool or str
+        SSL verification (fixed per client in httpx)
+    max_connections : int
+        Maximum concurrent connections across hosts
+    retries : int
+        Connection-failure retries
+    """
+
+    def __init__(
+        self,
+        *,
+        timeout: float,
+        verify: Union[bool, str] = True,
+        max_connections: int = 100,
+        retries: int = 0,
+    ) -> None:
+        if httpx is None:
+            raise ImportError(
+                "transport='httpx' requires httpx with HTTP/2 support: "
+                "pip install 'httpx[http2]'"
+            )
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        )
+        # RequestsCookieJar keeps the requests cookie API (set/get) on the
+        # jar httpx reads and writes
+        self.cookies = RequestsCookieJar()
+        self._client = httpx.Client(
+            http2=True,
+            transport=httpx.HTTPTransport(
+                http2=True, verify=verify, limits=limits, retries=retries
+            ),
+            timeout=timeout,
+            cookies=self.cookies,
+            follow_redirects=True,
+        )
+        self.headers = self._client.headers
+
+    @property
+    def auth(self) -> Any:
+        return self._client.auth
+
+    @auth.setter
+    def auth(self, value: Any) -> None:
+        self._client.auth = value
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        params: Optional[Dict[str, str]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        data: Optional[Union[str, bytes]] = None,
+        timeout: Optional[float] = None,
+        verify: Any = None,
+        stream: bool = False,
+    ) -> HttpxResponse:
+        """Send a request; ``verify`` is accepted for parity and ignored."""
+        req = self._client.build_request(
+            method,
+            url,
+            params=params,
+            headers=headers,
+            content=data,
+            timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+        )
+        try:
+            resp = self._client.send(req, stream=stream)
+        except httpx.TimeoutException as e:
+            raise requests.Timeout(str(e)) from e
+        except httpx.TransportError as e:
+            raise requests.ConnectionError(str(e)) from e
+        return HttpxResponse(resp, stream=stream)
+
+    def get(self, url: str, **kwargs: Any) -> HttpxResponse:
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url: str, **kwargs: Any) -> HttpxResponse:
+        return self.request("HEAD", url, **kwargs)
+
+    def close(self) -> None:
+        self._client.close()
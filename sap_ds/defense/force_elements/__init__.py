@@ -21,13 +21,19 @@ Usage:
         graph = client.get_graph(root_id="FE-001", depth=5)
 """
 
-from sap_ds.defense.force_elements.client import ForceElementClient
+from sap_ds.defense.force_elements.client import ForceElementClient, ForceElement
 from sap_ds.defense.force_elements.graph import fetch_fe_edges_all
-from sap_ds.defense.force_elements.tree import build_tree_table, build_tree_from_s4
-from sap_ds.defense.force_elements.labels import fetch_names_for_ids, deep_link
+from sap_ds.defense.force_elements.tree import (
+    build_tree_table, build_tree_from_s4, index_tree, apply_attrs_to_tree,
+)
+from sap_ds.defense.force_elements.labels import (
+    fetch_names_for_ids, deep_link, invalidate_single_name_cache
+)
 from sap_ds.defense.force_elements.readiness import fetch_readiness_bulk, apply_readiness_to_tree
-from sap_ds.defense.force_elements.symbol import fetch_sidc_bulk, apply_sidc_to_tree
-from sap_ds.defense.force_elements.hierarchy import fetch_nodes_bulk, fetch_children_bulk
+from sap_ds.defense.force_elements.symbol import fetch_sidc_bulk, apply_sidc_to_tree, sidc_icon_urls
+from sap_ds.defense.force_elements.hierarchy import (
+    fetch_nodes_bulk, fetch_children_bulk, invalidate_children_cache
+)
 from sap_ds.defense.force_elements.subgraph import slice_subgraph
 
 # Convenience aliases for common use cases
@@ -39,6 +45,7 @@ fetch_sidcs = fetch_sidc_bulk  # Fetch military symbols
 __all__ = [
     # Main client
     "ForceElementClient",
+    "ForceElement",
     # Graph traversal
     "fetch_fe_edges_all",
     "get_descendants_bfs",  # alias
@@ -46,9 +53,12 @@ __all__ = [
     "build_tree_table",
     "build_tree",  # alias
     "build_tree_from_s4",
+    "index_tree",
+    "apply_attrs_to_tree",
     # Labels & names
     "fetch_names_for_ids",
     "deep_link",
+    "invalidate_single_name_cache",
     # Readiness KPIs
     "fetch_readiness_bulk",
     "collect_readiness",  # alias
@@ -57,9 +67,11 @@ __all__ = [
     "fetch_sidc_bulk",
     "fetch_sidcs",  # alias
     "apply_sidc_to_tree",
+    "sidc_icon_urls",
     # Hierarchy traversal
     "fetch_nodes_bulk",
     "fetch_children_bulk",
+    "invalidate_children_cache",
     # Subgraph utilities
     "slice_subgraph",
 ]
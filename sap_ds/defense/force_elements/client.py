@@ -6,6 +6,7 @@ sap_ds.defense.force_elements.client - High-level Force Element Client
 from __future__ import annotations
 
 import logging
+from dataclasses import dataclass
 from typing import Any, Dict, List, Optional, Literal, TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -13,10 +14,12 @@ if TYPE_CHECKING:
     from sap_ds.core.session import SAPODataSession
 
 from sap_ds.defense.force_elements.graph import fetch_fe_edges_all
-from sap_ds.defense.force_elements.tree import build_tree_table, build_tree_from_s4
+from sap_ds.defense.force_elements.tree import (
+    build_tree_table, build_tree_from_s4, apply_attrs_to_tree
+)
 from sap_ds.defense.force_elements.labels import fetch_names_for_ids, deep_link, fetch_single_fe
-from sap_ds.defense.force_elements.readiness import fetch_readiness_bulk, apply_readiness_to_tree
-from sap_ds.defense.force_elements.symbol import fetch_sidc_bulk, apply_sidc_to_tree, get_sidc_field
+from sap_ds.defense.force_elements.readiness import fetch_readiness_bulk
+from sap_ds.defense.force_elements.symbol import fetch_sidc_bulk, sidc_icon_urls, get_sidc_field
 from sap_ds.defense.force_elements.hierarchy import (
     fetch_nodes_bulk, fetch_children_bulk, traverse_hierarchy
 )
@@ -28,6 +31,43 @@ logger = logging.getLogger("sap_ds.defense.fe")
 GraphSource = Literal["live", "cache"]
 
 
+@dataclass
+class ForceElement:
+    """
+    A single Force Element.
+    
+    Attributes
+    ----------
+    id : str
+        Force Element ID
+    name : str
+        Display name
+    type : str
+        Force Element type (e.g., "BATTALION")
+    status : str
+        Lifecycle status
+    parent_id : str, optional
+        Structural parent ID
+    location : str, optional
+        Location description
+    strength_authorized : int, optional
+        Authorized personnel strength
+    strength_assigned : int, optional
+        Assigned personnel strength
+    raw_data : dict, optional
+        Source OData record
+    """
+    id: str
+    name: str
+    type: str
+    status: str
+    parent_id: Optional[str] = None
+    location: Optional[str] = None
+    strength_authorized: Optional[int] = None
+    strength_assigned: Optional[int] = None
+    raw_data: Optional[Dict[str, Any]] = None
+
+
 class ForceElementClient:
     """
     High-level client for Force Element operations.
@@ -256,21 +296,24 @@ class ForceElementClient:
         tree = payload.get("tree", {})
         node_ids = {n["id"] for n in tree.get("nodes", [])}
         
-        # Enrich with readiness
+        # Enrich with readiness and SIDC in a single tree walk
+        attrs: Dict[str, Dict[str, Any]] = {}
         if include_readiness and node_ids:
-            readiness = fetch_readiness_bulk(
+            attrs["readiness"] = fetch_readiness_bulk(
                 self._session, node_ids,
                 sap_client=self._sap_client,
             )
-            apply_readiness_to_tree(payload, readiness)
             
-        # Enrich with SIDC
         if include_sidc and node_ids:
             sidcs = fetch_sidc_bulk(
                 self._session, node_ids,
                 sap_client=self._sap_client,
             )
-            apply_sidc_to_tree(payload, sidcs)
+            attrs["sidc"] = sidcs
+            attrs["iconUrl"] = sidc_icon_urls(sidcs)
+            
+        if attrs:
+            apply_attrs_to_tree(payload, attrs)
             
         return payload
         
@@ -285,6 +328,9 @@ class ForceElementClient:
         """
         Get minimal info for a single force element.
         
+        Names are memoized for a few minutes; call
+        invalidate_single_name_cache() after renaming force elements.
+        
         Returns
         -------
         dict
@@ -364,17 +410,22 @@ class ForceElementClient:
         *,
         hierarchy_type: str = "structure",
         max_depth: int = 10,
+        cache_ttl: Optional[float] = None,
     ) -> Dict[str, Dict[str, Any]]:
         """
         Traverse hierarchy from root.
         
-        Returns all discovered nodes.
+        Returns all discovered nodes. Pass ``cache_ttl`` (seconds) to reuse
+        children looked up by earlier traversals; after changing the
+        hierarchy, call invalidate_children_cache() or the cached children
+        stay stale until the TTL expires.
         """
         return traverse_hierarchy(
             self._session, root_id,
             parent_mode=hierarchy_type,
             max_depth=max_depth,
             sap_client=self._sap_client,
+            cache_ttl=cache_ttl,
         )
         
     # -------------------------------------------------------------------------
@@ -65,3 +65,8 @@ SIDC_FIELD_CANDIDATES = [
     "FrcElmntOrgMilSymbID",
     "FrcElmntOrgSymbol",
 ]
+
+# Bulk fetch: above this many IDs one unfiltered read of the entity set beats
+# issuing hundreds of OR-filter chunks (set to 0 to always chunk)
+FETCH_ALL_THRESHOLD = 2000
+FETCH_ALL_TOP = 100000
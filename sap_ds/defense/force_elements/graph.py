@@ -6,13 +6,14 @@ sap_ds.defense.force_elements.graph - Graph edge fetching via BFS
 from __future__ import annotations
 
 import logging
-from typing import Dict, List, Optional, Set
+from typing import Callable, Dict, List, Optional, Set
 
-from sap_ds.odata.service import ODataService, escape_odata_literal
-from sap_ds.core.session import SAPODataSession, ODataUpstreamError
+from sap_ds.odata.service import ODataService
+from sap_ds.core.session import SAPODataSession
 from sap_ds.defense.force_elements.constants import (
     SVC_GRAPH, ES_GRAPH_EDGE, SRC_FIELD, DST_FIELD, REL_FIELD
 )
+from sap_ds.defense.force_elements.utils import filter_or
 
 logger = logging.getLogger("sap_ds.defense.fe")
 
@@ -31,6 +32,7 @@ def fetch_fe_edges_all(
     sap_client: Optional[str] = None,
     batch_size: int = 20,
     max_pages: Optional[int] = None,
+    on_level: Optional[Callable[[List[str]], None]] = None,
 ) -> List[Dict[str, str]]:
     """
     BFS traversal from root_id up to `depth` hops, returning ALL relationship types.
@@ -49,6 +51,9 @@ def fetch_fe_edges_all(
         Number of IDs per OData query
     max_pages : int, optional
         Max pages per query
+    on_level : callable, optional
+        Called with the newly discovered IDs of each BFS level (the root
+        first), so callers can start per-ID work before traversal ends
         
     Returns
     -------
@@ -65,6 +70,9 @@ def fetch_fe_edges_all(
     edge_seen: Set[tuple] = set()
     edges: List[Dict[str, str]] = []
     
+    if on_level is not None:
+        on_level([root_id])
+        
     for _lvl in range(max(0, int(depth))):
         if not frontier:
             break
@@ -72,10 +80,7 @@ def fetch_fe_edges_all(
         next_frontier: List[str] = []
         
         for batch in _chunks(frontier, batch_size):
-            flt = " or ".join([
-                f"{SRC_FIELD} eq '{escape_odata_literal(x)}'" 
-                for x in batch
-            ])
+            flt = filter_or(SRC_FIELD, batch)
             
             query = {
                 "$select": f"{SRC_FIELD},{DST_FIELD},{REL_FIELD}",
@@ -83,20 +88,18 @@ def fetch_fe_edges_all(
                 "$top": "5000",
             }
             
-            try:
-                logger.debug(f"fetch_fe_edges_all: querying batch size={len(batch)}")
-                rows = svc.read_all(
-                    ES_GRAPH_EDGE,
-                    sap_client=sap_client,
-                    max_pages=max_pages,
-                    **query
-                )
-            except ODataUpstreamError:
-                raise
-                
-            logger.debug(f"fetch_fe_edges_all: retrieved rows={len(rows)}")
+            logger.debug(f"fetch_fe_edges_all: querying batch size={len(batch)}")
+            # Rows are consumed page by page; upstream errors propagate
+            rows = svc.read_all_iter(
+                ES_GRAPH_EDGE,
+                sap_client=sap_client,
+                max_pages=max_pages,
+                **query
+            )
+            n_rows = 0
             
             for r in rows:
+                n_rows += 1
                 src = str(r.get(SRC_FIELD, "")).strip()
                 dst = str(r.get(DST_FIELD, "")).strip()
                 rel = str(r.get(REL_FIELD, "")).strip()
@@ -113,6 +116,11 @@ def fetch_fe_edges_all(
                     discovered.add(dst)
                     next_frontier.append(dst)
                     
+            logger.debug(f"fetch_fe_edges_all: retrieved rows={n_rows}")
+            
+        if on_level is not None and next_frontier:
+            on_level(next_frontier)
+            
         frontier = next_frontier
         
     logger.info(f"fetch_fe_edges_all: completed, total edges={len(edges)}")
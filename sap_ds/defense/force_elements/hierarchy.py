@@ -6,28 +6,29 @@ sap_ds.defense.force_elements.hierarchy - Hierarchy traversal via TP entity
 from __future__ import annotations
 
 import logging
-from typing import Any, Dict, Iterable, List, Optional
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from sap_ds.odata.service import ODataService, escape_odata_literal
+from sap_ds.odata.service import ODataService
 from sap_ds.core.session import SAPODataSession, ODataUpstreamError
 from sap_ds.defense.force_elements.constants import (
-    SVC_FORCE_ELEMENT, ES_FORCE_ELEMENT_TP, PARENT_FIELDS
+    SVC_FORCE_ELEMENT, ES_FORCE_ELEMENT_TP, PARENT_FIELDS, FETCH_ALL_THRESHOLD
+)
+from sap_ds.defense.force_elements.utils import (
+    chunks, filter_or, iter_rows_for_ids, norm_ids
 )
 
 logger = logging.getLogger("sap_ds.defense.fe")
 
+# Parent -> child rows cache shared by traverse_hierarchy calls that opt in
+# with cache_ttl; least recently used parents are evicted beyond the cap
+CHILDREN_CACHE_MAX = 10_000
 
-def _chunks(items: List[str], n: int) -> Iterable[List[str]]:
-    for i in range(0, len(items), n):
-        yield items[i:i + n]
-
-
-def _filter_or(field: str, vals: List[str]) -> str:
-    """Build OR filter expression."""
-    return " or ".join([
-        f"{field} eq '{escape_odata_literal(v)}'" 
-        for v in vals
-    ])
+_ChildrenKey = Tuple[str, str, str, str]  # (base_url, sap_client, parent_mode, parent_id)
+_children_cache: "OrderedDict[_ChildrenKey, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+_children_cache_lock = threading.Lock()
 
 
 def fetch_nodes_bulk(
@@ -37,6 +38,7 @@ def fetch_nodes_bulk(
     sap_client: Optional[str] = None,
     timeout: Optional[float] = 10.0,
     chunk_size: int = 40,
+    fetch_all_threshold: int = FETCH_ALL_THRESHOLD,
 ) -> Dict[str, Dict[str, Any]]:
     """
     Fetch basic node fields for a set of Force Element IDs.
@@ -51,13 +53,15 @@ def fetch_nodes_bulk(
         SAP client override
     chunk_size : int
         Batch size
+    fetch_all_threshold : int
+        Above this many IDs, read all rows once instead of chunking
         
     Returns
     -------
     dict
         Mapping of ID -> node info dict
     """
-    id_list = sorted({str(x).strip() for x in ids if str(x).strip()})
+    id_list = norm_ids(ids)
     if not id_list:
         return {}
         
@@ -73,8 +77,51 @@ def fetch_nodes_bulk(
     out: Dict[str, Dict[str, Any]] = {}
     svc = ODataService(session, SVC_FORCE_ELEMENT, default_sap_client=sap_client)
     
-    for group in _chunks(id_list, int(chunk_size)):
-        flt = _filter_or("ForceElementOrgID", group)
+    rows = iter_rows_for_ids(
+        svc, id_list,
+        select=select,
+        sap_client=sap_client,
+        chunk_size=chunk_size,
+        active_only=True,
+        fetch_all_threshold=fetch_all_threshold,
+        caller="fetch_nodes_bulk",
+    )
+    for r in rows:
+        fe_id = str(r.get("ForceElementOrgID") or "").strip()
+        if not fe_id:
+            continue
+        out[fe_id] = {
+            "id": fe_id,
+            "name": str(r.get("FrcElmntOrgName") or fe_id),
+            "symbol": (str(r.get("FrcElmntOrgSymbol") or "").strip() or None),
+            "parent_structure": (str(r.get("FrcElmntOrgStrucParentID") or "").strip() or None),
+            "parent_peacetime": (str(r.get("FrcElmntOrgPeaceTimeParentID") or "").strip() or None),
+            "parent_wartime": (str(r.get("FrcElmntOrgWarTimeParentID") or "").strip() or None),
+        }
+        
+    return out
+
+
+def _iter_children_groups(
+    session: SAPODataSession,
+    parents: List[str],
+    pfield: str,
+    *,
+    sap_client: Optional[str] = None,
+    chunk_size: int = 25,
+) -> Iterator[Tuple[List[str], List[Dict[str, Any]]]]:
+    """Yield (parent group, child rows) for every chunk that was read successfully."""
+    select = ",".join([
+        "ForceElementOrgID",
+        "FrcElmntOrgName",
+        "FrcElmntOrgSymbol",
+        pfield,
+    ])
+    
+    svc = ODataService(session, SVC_FORCE_ELEMENT, default_sap_client=sap_client)
+    
+    for group in chunks(parents, int(chunk_size)):
+        flt = filter_or(pfield, group)
         flt = f"({flt}) and (IsActiveEntity eq true)"
         
         try:
@@ -87,23 +134,64 @@ def fetch_nodes_bulk(
                 }
             )
         except ODataUpstreamError as e:
-            logger.warning(f"fetch_nodes_bulk: error status={e.status}")
+            logger.warning(f"fetch_children_bulk: error status={e.status}")
             continue
             
-        for r in rows or []:
-            fe_id = str(r.get("ForceElementOrgID") or "").strip()
-            if not fe_id:
-                continue
-            out[fe_id] = {
-                "id": fe_id,
-                "name": str(r.get("FrcElmntOrgName") or fe_id),
-                "symbol": (str(r.get("FrcElmntOrgSymbol") or "").strip() or None),
-                "parent_structure": (str(r.get("FrcElmntOrgStrucParentID") or "").strip() or None),
-                "parent_peacetime": (str(r.get("FrcElmntOrgPeaceTimeParentID") or "").strip() or None),
-                "parent_wartime": (str(r.get("FrcElmntOrgWarTimeParentID") or "").strip() or None),
-            }
-            
-    return out
+        yield group, rows or []
+
+
+def _children_key_prefix(
+    session: SAPODataSession,
+    parent_mode: str,
+    sap_client: Optional[str],
+) -> Tuple[str, str, str]:
+    client = sap_client or session.cfg.default_sap_client or ""
+    return (session.base, str(client), parent_mode)
+
+
+def invalidate_children_cache(parent_ids: Optional[Iterable[str]] = None) -> None:
+    """
+    Drop cached parent -> children lookups.
+    
+    Nothing in sap_ds calls this; code that writes Force Elements must call
+    it so the next traversal with ``cache_ttl`` re-reads them.
+    
+    Parameters
+    ----------
+    parent_ids : iterable of str, optional
+        Only drop entries for these parents. Clears everything if omitted.
+    """
+    with _children_cache_lock:
+        if parent_ids is None:
+            _children_cache.clear()
+            return
+        drop = {str(x).strip() for x in parent_ids}
+        for key in [k for k in _children_cache if k[3] in drop]:
+            del _children_cache[key]
+
+
+def _cached_children(
+    key: _ChildrenKey,
+    now: float,
+    ttl: float,
+) -> Optional[List[Dict[str, Any]]]:
+    """Return fresh cached children for key; caller holds the lock."""
+    hit = _children_cache.get(key)
+    if hit is None:
+        return None
+    if now - hit[0] >= ttl:
+        del _children_cache[key]
+        return None
+    _children_cache.move_to_end(key)
+    return hit[1]
+
+
+def _cache_children(key: _ChildrenKey, now: float, rows: List[Dict[str, Any]]) -> None:
+    """Store children for key, evicting the LRU entry; caller holds the lock."""
+    _children_cache[key] = (now, rows)
+    _children_cache.move_to_end(key)
+    while len(_children_cache) > CHILDREN_CACHE_MAX:
+        _children_cache.popitem(last=False)
 
 
 def fetch_children_bulk(
@@ -138,37 +226,17 @@ def fetch_children_bulk(
     """
     pfield = PARENT_FIELDS.get(parent_mode) or PARENT_FIELDS["structure"]
     
-    parents = sorted({str(x).strip() for x in parent_ids if str(x).strip()})
+    parents = norm_ids(parent_ids)
     if not parents:
         return []
         
-    select = ",".join([
-        "ForceElementOrgID",
-        "FrcElmntOrgName",
-        "FrcElmntOrgSymbol",
-        pfield,
-    ])
-    
     rows_all: List[Dict[str, Any]] = []
-    svc = ODataService(session, SVC_FORCE_ELEMENT, default_sap_client=sap_client)
-    
-    for group in _chunks(parents, int(chunk_size)):
-        flt = _filter_or(pfield, group)
-        flt = f"({flt}) and (IsActiveEntity eq true)"
-        
-        try:
-            rows = svc.read(
-                ES_FORCE_ELEMENT_TP,
-                sap_client=sap_client,
-                **{
-                    "$select": select,
-                    "$filter": flt,
-                }
-            )
-            rows_all.extend(rows or [])
-        except ODataUpstreamError as e:
-            logger.warning(f"fetch_children_bulk: error status={e.status}")
-            continue
+    for _group, rows in _iter_children_groups(
+        session, parents, pfield,
+        sap_client=sap_client,
+        chunk_size=chunk_size,
+    ):
+        rows_all.extend(rows)
             
     return rows_all
 
@@ -180,6 +248,7 @@ def traverse_hierarchy(
     parent_mode: str = "structure",
     max_depth: int = 10,
     sap_client: Optional[str] = None,
+    cache_ttl: Optional[float] = None,
 ) -> Dict[str, Dict[str, Any]]:
     """
     Traverse hierarchy from root using specified parent mode.
@@ -196,6 +265,12 @@ def traverse_hierarchy(
         Maximum traversal depth
     sap_client : str, optional
         SAP client override
+    cache_ttl : float, optional
+        Reuse parent -> children lookups cached by earlier traversals for
+        this many seconds (default: no caching). This package never writes
+        Force Elements, so the cache cannot see changes: callers that create,
+        move or delete Force Elements must call invalidate_children_cache()
+        afterwards, or stale children are served until the TTL runs out.
         
     Returns
     -------
@@ -210,18 +285,46 @@ def traverse_hierarchy(
         return {}
     all_nodes.update(root_nodes)
     
+    pfield = PARENT_FIELDS.get(parent_mode) or PARENT_FIELDS["structure"]
+    prefix = _children_key_prefix(session, parent_mode, sap_client)
+    
     frontier = [root_id]
     
     for _depth in range(max_depth):
         if not frontier:
             break
             
-        children = fetch_children_bulk(
-            session, frontier,
-            parent_mode=parent_mode,
+        # Serve already-known subtrees from cache, query only the rest
+        children: List[Dict[str, Any]] = []
+        uncached: List[str] = []
+        if cache_ttl:
+            now = time.monotonic()
+            with _children_cache_lock:
+                for pid in frontier:
+                    hit = _cached_children(prefix + (pid,), now, cache_ttl)
+                    if hit is None:
+                        uncached.append(pid)
+                    else:
+                        children.extend(hit)
+        else:
+            uncached = frontier
+                    
+        for group, rows in _iter_children_groups(
+            session, uncached, pfield,
             sap_client=sap_client,
-        )
-        
+        ):
+            if cache_ttl:
+                by_parent: Dict[str, List[Dict[str, Any]]] = {pid: [] for pid in group}
+                for r in rows:
+                    pid = str(r.get(pfield) or "").strip()
+                    if pid in by_parent:
+                        by_parent[pid].append(r)
+                now = time.monotonic()
+                with _children_cache_lock:
+                    for pid, kids in by_parent.items():
+                        _cache_children(prefix + (pid,), now, kids)
+            children.extend(rows)
+            
         next_frontier = []
         for child in children:
             cid = str(child.get("ForceElementOrgID") or "").strip()
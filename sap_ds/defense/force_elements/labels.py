@@ -6,20 +6,38 @@ sap_ds.defense.force_elements.labels - Name resolution for Force Elements
 from __future__ import annotations
 
 import logging
-from typing import Dict, Iterable, List, Optional
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
 
 from sap_ds.odata.service import ODataService, escape_odata_literal
 from sap_ds.core.session import SAPODataSession, ODataUpstreamError
 from sap_ds.defense.force_elements.constants import (
-    SVC_FORCE_ELEMENT, ES_FORCE_ELEMENT_TP, ID_FIELD, NAME_FIELDS
+    SVC_FORCE_ELEMENT, ES_FORCE_ELEMENT_TP, ID_FIELD, NAME_FIELDS,
+    FETCH_ALL_THRESHOLD,
 )
+from sap_ds.defense.force_elements.utils import iter_rows_for_ids, norm_ids
 
 logger = logging.getLogger("sap_ds.defense.fe")
 
+# Memoized names for fetch_single_fe; entries expire after the TTL and least
+# recently used IDs are evicted beyond the cap
+SINGLE_NAME_CACHE_TTL = 300.0
+SINGLE_NAME_CACHE_MAX = 1024
 
-def _chunks(lst: List[str], n: int):
-    for i in range(0, len(lst), n):
-        yield lst[i:i + n]
+_NameKey = Tuple[str, str, str]  # (base_url, sap_client, fe_id)
+_SINGLE_NAME_CACHE: "OrderedDict[_NameKey, Tuple[float, str]]" = OrderedDict()
+_single_name_cache_lock = threading.Lock()
+
+
+def _row_name(r: Dict[str, Any]) -> str:
+    """First non-empty name field of a row, in preference order."""
+    for f in NAME_FIELDS:
+        v = r.get(f)
+        if v is not None and str(v).strip():
+            return str(v).strip()
+    return ""
 
 
 def deep_link(host: str, fe_id: str) -> str:
@@ -51,6 +69,7 @@ def fetch_names_for_ids(
     *,
     sap_client: Optional[str] = None,
     chunk_size: int = 20,
+    fetch_all_threshold: int = FETCH_ALL_THRESHOLD,
 ) -> Dict[str, str]:
     """
     Fetch Force Element names from C_FrcElmntOrgTP.
@@ -67,13 +86,15 @@ def fetch_names_for_ids(
         SAP client override
     chunk_size : int
         Batch size for queries
+    fetch_all_threshold : int
+        Above this many IDs, read all rows once instead of chunking
         
     Returns
     -------
     dict
         Mapping of ID -> name
     """
-    ids_list = sorted({str(x).strip() for x in ids if str(x).strip()})
+    ids_list = norm_ids(ids)
     if not ids_list:
         return {}
         
@@ -82,50 +103,76 @@ def fetch_names_for_ids(
     
     select_fields = ",".join([ID_FIELD] + NAME_FIELDS[:3])  # Limit to top 3
     
-    for batch in _chunks(ids_list, chunk_size):
-        flt = " or ".join([
-            f"{ID_FIELD} eq '{escape_odata_literal(x)}'" 
-            for x in batch
-        ])
-        
-        try:
-            rows = svc.read(
-                ES_FORCE_ELEMENT_TP,
-                sap_client=sap_client,
-                **{
-                    "$select": select_fields,
-                    "$filter": flt,
-                    "$top": str(len(batch)),
-                }
-            )
+    rows = iter_rows_for_ids(
+        svc, ids_list,
+        select=select_fields,
+        sap_client=sap_client,
+        chunk_size=chunk_size,
+        fetch_all_threshold=fetch_all_threshold,
+        caller="fetch_names_for_ids",
+    )
+    for r in rows:
+        fe_id = str(r.get(ID_FIELD, "")).strip()
+        if not fe_id:
+            continue
             
-            for r in rows:
-                fe_id = str(r.get(ID_FIELD, "")).strip()
-                if not fe_id:
-                    continue
-                    
-                name = ""
-                for f in NAME_FIELDS:
-                    v = r.get(f)
-                    if v is not None and str(v).strip():
-                        name = str(v).strip()
-                        break
-                        
-                out[fe_id] = name or fe_id
-                
-        except ODataUpstreamError as e:
-            logger.warning(f"fetch_names_for_ids: batch failed status={e.status}")
-            # Fill with IDs on failure
-            for x in batch:
-                out.setdefault(x, x)
-                
-    # Ensure all requested IDs exist
+        out[fe_id] = _row_name(r) or fe_id
+        
+    # Ensure all requested IDs exist (falls back to ID on failed batches)
     for x in ids_list:
         out.setdefault(x, x)
         
     return out
 
 
+def _fetch_single_name(
+    session: SAPODataSession,
+    fe_id: str,
+    *,
+    sap_client: Optional[str] = None,
+) -> Optional[str]:
+    """Read one Force Element's name with a single GET; None if not found or on error."""
+    svc = ODataService(session, SVC_FORCE_ELEMENT, default_sap_client=sap_client)
+    try:
+        rows = svc.read(
+            ES_FORCE_ELEMENT_TP,
+            sap_client=sap_client,
+            **{
+                "$select": ",".join([ID_FIELD] + NAME_FIELDS[:3]),
+                "$filter": f"{ID_FIELD} eq '{escape_odata_literal(fe_id.strip())}'",
+                "$top": "1",
+            }
+        )
+    except ODataUpstreamError as e:
+        logger.warning(f"fetch_single_fe: failed status={e.status}")
+        return None
+        
+    if not rows:
+        return None
+    return _row_name(rows[0]) or fe_id
+
+
+def invalidate_single_name_cache(fe_ids: Optional[Iterable[str]] = None) -> None:
+    """
+    Drop memoized fetch_single_fe names.
+    
+    Nothing in sap_ds calls this; code that renames Force Elements must call
+    it so the next lookup re-reads them.
+    
+    Parameters
+    ----------
+    fe_ids : iterable of str, optional
+        Only drop entries for these IDs. Clears everything if omitted.
+    """
+    with _single_name_cache_lock:
+        if fe_ids is None:
+            _SINGLE_NAME_CACHE.clear()
+            return
+        drop = {str(x).strip() for x in fe_ids}
+        for key in [k for k in _SINGLE_NAME_CACHE if k[2] in drop]:
+            del _SINGLE_NAME_CACHE[key]
+
+
 def fetch_single_fe(
     session: SAPODataSession,
     fe_id: str,
@@ -136,14 +183,40 @@ def fetch_single_fe(
     """
     Fetch minimal info for a single Force Element.
     
+    Issues one direct GET (no bulk chunking) and memoizes the name per
+    system/client for SINGLE_NAME_CACHE_TTL seconds for repeated interactive
+    lookups. Callers that rename Force Elements must call
+    invalidate_single_name_cache() afterwards, or the old name is returned
+    until the TTL runs out. Falls back to the ID if the element is not found
+    or the read fails.
+    
     Returns
     -------
     dict
         {"id": ..., "name": ..., "url": ...}
     """
-    names = fetch_names_for_ids(session, [fe_id], sap_client=sap_client)
+    fe_id = str(fe_id).strip()
+    key = (session.base, str(sap_client or session.cfg.default_sap_client or ""), fe_id)
+    with _single_name_cache_lock:
+        hit = _SINGLE_NAME_CACHE.get(key)
+        if hit is not None and time.monotonic() - hit[0] >= SINGLE_NAME_CACHE_TTL:
+            del _SINGLE_NAME_CACHE[key]
+            hit = None
+        if hit is not None:
+            _SINGLE_NAME_CACHE.move_to_end(key)
+    name = hit[1] if hit is not None else None
+    if name is None:
+        name = _fetch_single_name(session, fe_id, sap_client=sap_client)
+        if name is not None:
+            with _single_name_cache_lock:
+                _SINGLE_NAME_CACHE[key] = (time.monotonic(), name)
+                _SINGLE_NAME_CACHE.move_to_end(key)
+                while len(_SINGLE_NAME_CACHE) > SINGLE_NAME_CACHE_MAX:
+                    _SINGLE_NAME_CACHE.popitem(last=False)
+            
     return {
         "id": fe_id,
-        "name": names.get(fe_id, fe_id),
+        "name": name or fe_id,
         "url": deep_link(host, fe_id),
     }
+
@@ -8,40 +8,29 @@ from __future__ import annotations
 import logging
 from typing import Any, Dict, Iterable, List, Optional
 
-from sap_ds.odata.service import ODataService, escape_odata_literal
-from sap_ds.core.session import SAPODataSession, ODataUpstreamError
+from sap_ds.odata.service import ODataService
+from sap_ds.core.session import SAPODataSession
 from sap_ds.defense.force_elements.constants import (
-    SVC_FORCE_ELEMENT, ES_FORCE_ELEMENT_TP, ID_FIELD, READINESS_FIELDS
+    SVC_FORCE_ELEMENT, ID_FIELD, READINESS_FIELDS, FETCH_ALL_THRESHOLD
 )
+from sap_ds.defense.force_elements.utils import iter_rows_for_ids, norm_ids
+from sap_ds.defense.force_elements.tree import apply_attrs_to_tree
 
 logger = logging.getLogger("sap_ds.defense.fe")
 
 
-def _chunks(items: List[str], n: int) -> Iterable[List[str]]:
-    for i in range(0, len(items), n):
-        yield items[i:i + n]
-
-
-def _filter_or(ids: List[str]) -> str:
-    return " or ".join([
-        f"{ID_FIELD} eq '{escape_odata_literal(i)}'" 
-        for i in ids
-    ])
-
-
 def _to_int_pct(v: Any) -> Optional[int]:
     """Normalize readiness percent fields to 0..100 int."""
     if v is None:
         return None
-    if isinstance(v, int):
-        return max(0, min(100, v))
-    s = str(v).strip()
-    if not s:
-        return None
+    if type(v) is int:
+        # Common case: JSON number, no conversion needed
+        return 0 if v < 0 else 100 if v > 100 else v
     try:
-        return max(0, min(100, int(s)))
-    except Exception:
+        i = int(v)  # str (surrounding whitespace allowed) or float
+    except (TypeError, ValueError, OverflowError):
         return None
+    return 0 if i < 0 else 100 if i > 100 else i
 
 
 def _derive_score(
@@ -54,13 +43,15 @@ def _derive_score(
     return int(min(vals)) if vals else 0
 
 
-def _score_to_status(score: int) -> str:
-    """Map score to status label."""
-    if score >= 85:
-        return "FMC"  # Fully Mission Capable
-    if score >= 60:
-        return "PMC"  # Partially Mission Capable
-    return "NMC"  # Not Mission Capable
+# Score (0..100) -> status label: FMC >= 85 > PMC >= 60 > NMC
+_STATUS_TABLE: List[str] = (
+    ["NMC"] * 60  # Not Mission Capable
+    + ["PMC"] * 25  # Partially Mission Capable
+    + ["FMC"] * 16  # Fully Mission Capable
+)
+
+# Map score to status label (scores are already clamped to 0..100)
+_score_to_status = _STATUS_TABLE.__getitem__
 
 
 def fetch_readiness_bulk(
@@ -70,6 +61,7 @@ def fetch_readiness_bulk(
     sap_client: Optional[str] = None,
     chunk_size: int = 40,
     timeout: Optional[float] = None,
+    fetch_all_threshold: int = FETCH_ALL_THRESHOLD,
 ) -> Dict[str, Dict[str, Any]]:
     """
     Bulk-read readiness KPI percentages for Force Elements.
@@ -84,6 +76,8 @@ def fetch_readiness_bulk(
         SAP client override
     chunk_size : int
         Batch size
+    fetch_all_threshold : int
+        Above this many IDs, read all rows once instead of chunking
         
     Returns
     -------
@@ -95,7 +89,7 @@ def fetch_readiness_bulk(
             "kpis": {"materialPct": ..., "personnelPct": ..., "trainingPct": ...}
         }
     """
-    id_list = sorted({str(x).strip() for x in ids if str(x).strip()})
+    id_list = norm_ids(ids)
     if not id_list:
         return {}
         
@@ -104,44 +98,36 @@ def fetch_readiness_bulk(
     select = ",".join([ID_FIELD] + READINESS_FIELDS)
     svc = ODataService(session, SVC_FORCE_ELEMENT, default_sap_client=sap_client)
     
-    for group in _chunks(id_list, int(chunk_size)):
-        flt = _filter_or(group)
-        
-        try:
-            rows = svc.read(
-                ES_FORCE_ELEMENT_TP,
-                sap_client=sap_client,
-                **{
-                    "$select": select,
-                    "$filter": flt,
-                }
-            )
-        except ODataUpstreamError as e:
-            logger.warning(f"fetch_readiness_bulk: error status={e.status}")
+    rows = iter_rows_for_ids(
+        svc, id_list,
+        select=select,
+        sap_client=sap_client,
+        chunk_size=chunk_size,
+        fetch_all_threshold=fetch_all_threshold,
+        caller="fetch_readiness_bulk",
+    )
+    for r in rows:
+        fe_id = str(r.get(ID_FIELD) or "").strip()
+        if not fe_id:
             continue
             
-        for r in rows or []:
-            fe_id = str(r.get(ID_FIELD) or "").strip()
-            if not fe_id:
-                continue
-                
-            material = _to_int_pct(r.get("FrcElmntOrgMatlRdnssPct"))
-            personnel = _to_int_pct(r.get("FrcElmntOrgPrsnlRdnssPct"))
-            training = _to_int_pct(r.get("FrcElmntOrgTrngRdnssPct"))
-            
-            score = _derive_score(material, personnel, training)
-            status = _score_to_status(score)
-            
-            out[fe_id] = {
-                "status": status,
-                "score": score,
-                "kpis": {
-                    "materialPct": material,
-                    "personnelPct": personnel,
-                    "trainingPct": training,
-                }
+        material = _to_int_pct(r.get("FrcElmntOrgMatlRdnssPct"))
+        personnel = _to_int_pct(r.get("FrcElmntOrgPrsnlRdnssPct"))
+        training = _to_int_pct(r.get("FrcElmntOrgTrngRdnssPct"))
+        
+        score = _derive_score(material, personnel, training)
+        status = _score_to_status(score)
+        
+        out[fe_id] = {
+            "status": status,
+            "score": score,
+            "kpis": {
+                "materialPct": material,
+                "personnelPct": personnel,
+                "trainingPct": training,
             }
-            
+        }
+        
     return out
 
 
@@ -159,24 +145,4 @@ def apply_readiness_to_tree(
     readiness_by_id : dict
         Mapping of ID -> readiness info
     """
-    tree = payload.get("tree", {})
-    nodes = tree.get("nodes", [])
-    
-    for node in nodes:
-        nid = str(node.get("id") or "")
-        if nid and nid in readiness_by_id:
-            node["readiness"] = readiness_by_id[nid]
-            
-    # Also apply to nested roots
-    def apply_nested(items: List[Dict]) -> None:
-        for item in items:
-            nid = str(item.get("id") or "")
-            if nid and nid in readiness_by_id:
-                item["readiness"] = readiness_by_id[nid]
-            children = item.get("children", [])
-            if children and isinstance(children[0], dict):
-                apply_nested(children)
-                
-    roots = tree.get("roots", [])
-    if roots:
-        apply_nested(roots)
+    apply_attrs_to_tree(payload, {"readiness": readiness_by_id})
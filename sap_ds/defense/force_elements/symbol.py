@@ -6,13 +6,16 @@ sap_ds.defense.force_elements.symbol - Military symbol (SIDC) handling
 from __future__ import annotations
 
 import logging
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, Dict, Iterable, Optional
 
-from sap_ds.odata.service import ODataService, escape_odata_literal
+from sap_ds.odata.service import ODataService
 from sap_ds.core.session import SAPODataSession, ODataUpstreamError
 from sap_ds.defense.force_elements.constants import (
-    SVC_FORCE_ELEMENT, ES_FORCE_ELEMENT_TP, ID_FIELD, SIDC_FIELD_CANDIDATES
+    SVC_FORCE_ELEMENT, ES_FORCE_ELEMENT_TP, ID_FIELD, SIDC_FIELD_CANDIDATES,
+    FETCH_ALL_THRESHOLD,
 )
+from sap_ds.defense.force_elements.utils import iter_rows_for_ids, norm_ids
+from sap_ds.defense.force_elements.tree import apply_attrs_to_tree
 
 logger = logging.getLogger("sap_ds.defense.fe")
 
@@ -21,18 +24,6 @@ _SIDC_FIELD: Optional[str] = None
 _SIDC_PROBE_COMPLETE: bool = False
 
 
-def _chunks(items: List[str], n: int) -> Iterable[List[str]]:
-    for i in range(0, len(items), n):
-        yield items[i:i + n]
-
-
-def _filter_or(ids: List[str]) -> str:
-    return " or ".join([
-        f"{ID_FIELD} eq '{escape_odata_literal(i)}'" 
-        for i in ids
-    ])
-
-
 def _normalize_sidc(v: Any) -> Optional[str]:
     """Normalize SIDC value."""
     if v is None:
@@ -49,7 +40,8 @@ def _probe_sidc_field(
     """
     Discover which property contains SIDC/military symbol code.
     
-    Tries candidate field names until one works.
+    Matches candidate field names against the entity set's properties
+    from $metadata (one cached request instead of one probe per candidate).
     Result is cached for process lifetime.
     """
     global _SIDC_FIELD, _SIDC_PROBE_COMPLETE
@@ -59,29 +51,21 @@ def _probe_sidc_field(
         
     svc = ODataService(session, SVC_FORCE_ELEMENT, default_sap_client=sap_client)
     
-    for field in SIDC_FIELD_CANDIDATES:
-        try:
-            rows = svc.read(
-                ES_FORCE_ELEMENT_TP,
-                sap_client=sap_client,
-                **{
-                    "$top": "1",
-                    "$select": f"{ID_FIELD},{field}",
-                }
-            )
-            # If we get here, field exists
-            _SIDC_FIELD = field
-            _SIDC_PROBE_COMPLETE = True
-            logger.info(f"symbol: discovered SIDC field '{field}'")
-            return _SIDC_FIELD
-            
-        except ODataUpstreamError as e:
-            logger.debug(f"symbol: SIDC probe failed for field='{field}'")
-            continue
-            
+    try:
+        props = svc.get_properties(ES_FORCE_ELEMENT_TP)
+    except ODataUpstreamError as e:
+        # Not cached: the next call retries discovery
+        logger.warning(f"symbol: $metadata read failed status={e.status}")
+        return None
+        
+    _SIDC_FIELD = next((f for f in SIDC_FIELD_CANDIDATES if f in props), None)
     _SIDC_PROBE_COMPLETE = True
-    logger.warning("symbol: no SIDC field found")
-    return None
+    
+    if _SIDC_FIELD:
+        logger.info(f"symbol: discovered SIDC field '{_SIDC_FIELD}'")
+    else:
+        logger.warning("symbol: no SIDC field found")
+    return _SIDC_FIELD
 
 
 def get_sidc_field(
@@ -103,6 +87,7 @@ def fetch_sidc_bulk(
     *,
     sap_client: Optional[str] = None,
     chunk_size: int = 40,
+    fetch_all_threshold: int = FETCH_ALL_THRESHOLD,
 ) -> Dict[str, str]:
     """
     Bulk-fetch SIDC codes for Force Elements.
@@ -117,6 +102,8 @@ def fetch_sidc_bulk(
         SAP client override
     chunk_size : int
         Batch size
+    fetch_all_threshold : int
+        Above this many IDs, read all rows once instead of chunking
         
     Returns
     -------
@@ -127,7 +114,7 @@ def fetch_sidc_bulk(
     if not sidc_field:
         return {}
         
-    id_list = sorted({str(x).strip() for x in ids if str(x).strip()})
+    id_list = norm_ids(ids)
     if not id_list:
         return {}
         
@@ -136,31 +123,49 @@ def fetch_sidc_bulk(
     
     select = f"{ID_FIELD},{sidc_field}"
     
-    for group in _chunks(id_list, int(chunk_size)):
-        flt = _filter_or(group)
-        
-        try:
-            rows = svc.read(
-                ES_FORCE_ELEMENT_TP,
-                sap_client=sap_client,
-                **{
-                    "$select": select,
-                    "$filter": flt,
-                }
-            )
-        except ODataUpstreamError as e:
-            logger.warning(f"fetch_sidc_bulk: error status={e.status}")
-            continue
+    rows = iter_rows_for_ids(
+        svc, id_list,
+        select=select,
+        sap_client=sap_client,
+        chunk_size=chunk_size,
+        fetch_all_threshold=fetch_all_threshold,
+        caller="fetch_sidc_bulk",
+    )
+    for r in rows:
+        fe_id = str(r.get(ID_FIELD) or "").strip()
+        sidc = _normalize_sidc(r.get(sidc_field))
+        if fe_id and sidc:
+            out[fe_id] = sidc
             
-        for r in rows or []:
-            fe_id = str(r.get(ID_FIELD) or "").strip()
-            sidc = _normalize_sidc(r.get(sidc_field))
-            if fe_id and sidc:
-                out[fe_id] = sidc
-                
     return out
 
 
+def sidc_icon_urls(
+    sidc_by_id: Dict[str, str],
+    *,
+    icon_base_url: str = "/icons/cache",
+) -> Dict[str, str]:
+    """
+    Build ID -> icon URL mapping for SIDC codes.
+    
+    Parameters
+    ----------
+    sidc_by_id : dict
+        Mapping of ID -> SIDC string
+    icon_base_url : str
+        Base URL for icon assets
+        
+    Returns
+    -------
+    dict
+        Mapping of ID -> icon URL
+    """
+    # Generate icon URL from SIDC (simplified). Unit types repeat across an
+    # org, so render each distinct SIDC once and share the string.
+    url_by_sidc = {sidc: f"{icon_base_url}/{sidc}.svg" for sidc in set(sidc_by_id.values())}
+    return {nid: url_by_sidc[sidc] for nid, sidc in sidc_by_id.items()}
+
+
 def apply_sidc_to_tree(
     payload: Dict[str, Any],
     sidc_by_id: Dict[str, str],
@@ -181,29 +186,7 @@ def apply_sidc_to_tree(
     icon_base_url : str
         Base URL for icon assets
     """
-    tree = payload.get("tree", {})
-    nodes = tree.get("nodes", [])
-    
-    for node in nodes:
-        nid = str(node.get("id") or "")
-        if nid and nid in sidc_by_id:
-            sidc = sidc_by_id[nid]
-            node["sidc"] = sidc
-            # Generate icon URL from SIDC (simplified)
-            node["iconUrl"] = f"{icon_base_url}/{sidc}.svg"
-            
-    # Also apply to nested roots
-    def apply_nested(items: List[Dict]) -> None:
-        for item in items:
-            nid = str(item.get("id") or "")
-            if nid and nid in sidc_by_id:
-                sidc = sidc_by_id[nid]
-                item["sidc"] = sidc
-                item["iconUrl"] = f"{icon_base_url}/{sidc}.svg"
-            children = item.get("children", [])
-            if children and isinstance(children[0], dict):
-                apply_nested(children)
-                
-    roots = tree.get("roots", [])
-    if roots:
-        apply_nested(roots)
+    apply_attrs_to_tree(payload, {
+        "sidc": sidc_by_id,
+        "iconUrl": sidc_icon_urls(sidc_by_id, icon_base_url=icon_base_url),
+    })
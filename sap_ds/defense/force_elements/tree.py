@@ -6,7 +6,10 @@ sap_ds.defense.force_elements.tree - Tree table building
 from __future__ import annotations
 
 import logging
-from typing import Any, Dict, List, Optional
+import sys
+from array import array
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
 
 from sap_ds.odata.service import escape_odata_literal
 from sap_ds.core.session import SAPODataSession
@@ -16,6 +19,107 @@ from sap_ds.defense.force_elements.labels import fetch_names_for_ids, deep_link
 
 logger = logging.getLogger("sap_ds.defense.fe")
 
+# Concurrent per-level name fetches in build_tree_from_s4
+NAME_FETCH_WORKERS = 2
+
+
+def _iter_tree_nodes(payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Yield every node dict of a tree payload, flat and nested views alike.
+    
+    Uses an explicit stack, so deep hierarchies never hit the recursion limit.
+    """
+    tree = payload.get("tree", {})
+    stack: List[Dict[str, Any]] = list(tree.get("nodes", []))
+    stack.extend(tree.get("roots", []))
+    
+    while stack:
+        node = stack.pop()
+        yield node
+        children = node.get("children")
+        if children:
+            # Flat nodes carry child IDs, nested nodes carry child dicts
+            stack.extend(c for c in children if isinstance(c, dict))
+
+
+def index_tree(payload: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Index a tree payload by node ID.
+    
+    Each ID maps to every dict representing that node (the flat ``nodes``
+    entry and its copy in the nested ``roots`` view). IDs are interned.
+    
+    Parameters
+    ----------
+    payload : dict
+        Tree payload from build_tree_table
+        
+    Returns
+    -------
+    dict
+        Mapping of ID -> list of node dicts
+    """
+    index: Dict[str, List[Dict[str, Any]]] = {}
+    for node in _iter_tree_nodes(payload):
+        nid = node.get("id")
+        if not nid:
+            continue
+        nid = sys.intern(str(nid))
+        refs = index.get(nid)
+        if refs is None:
+            index[nid] = [node]
+        else:
+            refs.append(node)
+    return index
+
+
+def apply_attrs_to_tree(
+    payload: Dict[str, Any],
+    attr_map: Dict[str, Dict[str, Any]],
+    *,
+    index: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+) -> None:
+    """
+    Set several node attributes on a tree payload with one tree walk.
+    
+    The tree is indexed once; each attribute mapping is then applied by
+    iterating whichever is smaller, the mapping or the index.
+    
+    Parameters
+    ----------
+    payload : dict
+        Tree payload from build_tree_table
+    attr_map : dict
+        Mapping of attribute name -> (ID -> value), e.g.
+        ``{"readiness": readiness_by_id, "sidc": sidc_by_id}``
+    index : dict, optional
+        Prebuilt index_tree(payload), reused across calls
+        
+    Examples
+    --------
+    >>> apply_attrs_to_tree(payload, {
+    ...     "readiness": fetch_readiness_bulk(sess, ids),
+    ...     "sidc": sidcs,
+    ...     "iconUrl": sidc_icon_urls(sidcs),
+    ... })
+    """
+    attrs = [(name, by_id) for name, by_id in attr_map.items() if by_id]
+    if not attrs:
+        return
+    idx = index if index is not None else index_tree(payload)
+    
+    for name, by_id in attrs:
+        if len(by_id) <= len(idx):
+            for nid, value in by_id.items():
+                for node in idx.get(nid, ()):
+                    node[name] = value
+        else:
+            for nid, refs in idx.items():
+                if nid in by_id:
+                    value = by_id[nid]
+                    for node in refs:
+                        node[name] = value
+
 
 def build_tree_table(
     root_id: str,
@@ -51,83 +155,102 @@ def build_tree_table(
     logger.info(f"build_tree_table: root_id={root_id}, depth={depth}, edges={len(edges_all)}")
     
     # 1) Build adjacency from B002 only (structural hierarchy)
+    #    (hot loop, locals bound; IDs are stripped as callers may pass padded edges)
     adj: Dict[str, List[str]] = {}
+    adj_get = adj.setdefault
+    rel_struct = REL_STRUCTURE
+    edge_count_struct = 0
     for e in edges_all:
-        if (e.get("rel") or "").upper() != REL_STRUCTURE:
+        rel = e.get("rel")
+        if not rel or rel.upper() != rel_struct:
             continue
+        edge_count_struct += 1
         src = (e.get("source") or "").strip()
         dst = (e.get("target") or "").strip()
         if not src or not dst:
             continue
-        adj.setdefault(src, []).append(dst)
+        adj_get(src, []).append(dst)
         
-    # 2) BFS to compute parent/level within depth
-    parent: Dict[str, Optional[str]] = {root_id: None}
-    level: Dict[str, int] = {root_id: 0}
-    q: List[str] = [root_id]
-    
-    while q:
-        cur = q.pop(0)
-        cur_lvl = level[cur]
-        if cur_lvl >= int(depth):
-            continue
-        for ch in adj.get(cur, []):
-            if ch not in level:
-                parent[ch] = cur
-                level[ch] = cur_lvl + 1
-                q.append(ch)
-                
-    # 3) Build children lists
-    children_ids: Dict[str, List[str]] = {nid: [] for nid in level.keys()}
-    for nid, p in parent.items():
-        if p is not None:
-            children_ids.setdefault(p, []).append(nid)
-            
-    # Stable ordering
-    for k in list(children_ids.keys()):
-        children_ids[k] = sorted(children_ids[k])
+    # Stable child ordering: sort each adjacency list once up front
+    for dsts in adj.values():
+        dsts.sort()
         
-    # 4) Build flat nodes list
-    nodes_flat: List[Dict[str, Any]] = []
-    for nid in sorted(level.keys(), key=lambda x: (level[x], x)):
-        nodes_flat.append({
+    # 2) Level-synchronous BFS within depth over dense integer indices.
+    #    Indices are assigned in discovery order, so scanning them in order
+    #    is the BFS queue itself and yields nodes grouped by level. Per-node
+    #    state lives in parallel arrays; only the visited check hashes
+    #    string IDs.
+    max_depth = int(depth)
+    idx_of: Dict[str, int] = {root_id: 0}
+    id_of: List[str] = [root_id]
+    parent_arr: List[int] = [-1]
+    level_arr = array("i", [0])
+    children_arr: List[List[int]] = [[]]
+    
+    i = 0
+    while i < len(id_of):
+        cur_lvl = level_arr[i]
+        if cur_lvl < max_depth:
+            kids = children_arr[i]
+            for ch in adj.get(id_of[i], ()):
+                if ch not in idx_of:
+                    j = len(id_of)
+                    idx_of[ch] = j
+                    id_of.append(ch)
+                    parent_arr.append(i)
+                    level_arr.append(cur_lvl + 1)
+                    children_arr.append([])
+                    kids.append(j)
+        i += 1
+        
+    # 3) Resolve indices back to string IDs once, at output time
+    by_idx: List[Dict[str, Any]] = []
+    for i, nid in enumerate(id_of):
+        p = parent_arr[i]
+        by_idx.append({
             "id": nid,
             "name": names.get(nid) or nid,
             "short": "",
             "type": "ORG",
-            "parentId": parent.get(nid),
-            "level": level[nid],
-            "children": children_ids.get(nid, []),
+            "parentId": id_of[p] if p >= 0 else None,
+            "level": level_arr[i],
+            "children": [id_of[k] for k in children_arr[i]],
             "s4Url": deep_link(deeplink_host, nid),
             "readiness": {"status": "UNK", "score": 0},
             "iconUrl": "/icons/cache/unit-default.svg",
         })
         
-    # Flat lookup
-    flat_by_id = {n["id"]: dict(n) for n in nodes_flat}
-    
-    # Build nested view
-    def nest(nid: str) -> Dict[str, Any]:
-        n = flat_by_id.get(nid)
-        if not n:
-            return {"id": nid, "name": names.get(nid) or nid, "type": "ORG", "children": []}
-        kids = list(n.get("children") or [])
-        out = dict(n)
-        out["children"] = [nest(k) for k in kids if k in flat_by_id]
-        return out
+    # Build nested view bottom-up: every child index is greater than its
+    # parent's, so walking indices in reverse needs no recursion. One shallow
+    # copy per node (the views differ only in "children"); the readiness
+    # dict is shared, as apply_attrs_to_tree replaces it rather than mutating.
+    nested: List[Dict[str, Any]] = [{}] * len(by_idx)
+    for i in range(len(by_idx) - 1, -1, -1):
+        nested[i] = {**by_idx[i], "children": [nested[k] for k in children_arr[i]]}
         
-    roots_nested = [nest(root_id)] if root_id in flat_by_id else []
+    roots_nested = [nested[0]]
+    
+    # 4) Flat list ordered by (level, id): levels are already contiguous
+    #    index ranges, so only sort within each level bucket
+    nodes_flat: List[Dict[str, Any]] = []
+    start = 0
+    n_nodes = len(id_of)
+    while start < n_nodes:
+        end = start
+        lvl = level_arr[start]
+        while end < n_nodes and level_arr[end] == lvl:
+            end += 1
+        bucket = sorted(range(start, end), key=id_of.__getitem__)
+        nodes_flat.extend([by_idx[i] for i in bucket])
+        start = end
     
     meta = {
-        "depth_requested": int(depth),
-        "depth_reached": max(level.values()) if level else 0,
+        "depth_requested": max_depth,
+        "depth_reached": level_arr[-1],  # BFS order: last is deepest
         "node_count": len(nodes_flat),
         "struct_rel": REL_STRUCTURE,
         "edge_count_total": len(edges_all),
-        "edge_count_struct": sum(
-            1 for e in edges_all 
-            if (e.get("rel") or "").upper() == REL_STRUCTURE
-        ),
+        "edge_count_struct": edge_count_struct,
     }
     
     return {
@@ -152,7 +275,9 @@ def build_tree_from_s4(
     """
     Build tree by fetching from S/4HANA.
     
-    Fetches edges via graph service, resolves names, builds tree.
+    Fetches edges via graph service, resolves names, builds tree. Names
+    for each BFS level are fetched on worker threads while the next level
+    of edges is still being traversed.
     
     Parameters
     ----------
@@ -174,19 +299,25 @@ def build_tree_from_s4(
     """
     logger.info(f"build_tree_from_s4: root_id={root_id}, depth={depth}")
     
-    edges_all = fetch_fe_edges_all(
-        session, root_id, 
-        depth=depth, 
-        sap_client=sap_client
-    )
-    
-    # Collect all IDs
-    ids = {root_id}
-    for e in edges_all:
-        ids.add(e["source"])
-        ids.add(e["target"])
+    with ThreadPoolExecutor(max_workers=NAME_FETCH_WORKERS) as pool:
+        name_futures: List[Future] = []
         
-    names = fetch_names_for_ids(session, ids, sap_client=sap_client)
+        def on_level(new_ids: List[str]) -> None:
+            name_futures.append(
+                pool.submit(fetch_names_for_ids, session, new_ids, sap_client=sap_client)
+            )
+            
+        edges_all = fetch_fe_edges_all(
+            session, root_id, 
+            depth=depth, 
+            sap_client=sap_client,
+            on_level=on_level,
+        )
+        
+        names: Dict[str, str] = {}
+        for f in name_futures:
+            names.update(f.result())
+            
     logger.info(f"build_tree_from_s4: fetched names count={len(names)}")
     
     payload = build_tree_table(
@@ -0,0 +1,165 @@
+"""
+sap_ds.defense.force_elements.utils - Shared helpers for bulk fetchers
+=======================================================================
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+from sap_ds.odata.service import ODataService, escape_odata_literal
+from sap_ds.core.session import ODataUpstreamError
+from sap_ds.defense.force_elements.constants import (
+    ES_FORCE_ELEMENT_TP, ID_FIELD, FETCH_ALL_THRESHOLD, FETCH_ALL_TOP
+)
+
+logger = logging.getLogger("sap_ds.defense.fe")
+
+
+def chunks(items: List[str], n: int) -> Iterable[List[str]]:
+    """Yield successive slices of `items` of length `n`."""
+    for i in range(0, len(items), n):
+        yield items[i:i + n]
+
+
+def norm_ids(ids: Iterable[object]) -> List[str]:
+    """
+    Normalize IDs to unique, non-empty, stripped strings.
+    
+    Preserves first-seen order; OData filters do not care about order,
+    so no sort is needed.
+    
+    Parameters
+    ----------
+    ids : iterable
+        Raw IDs (any type, converted with str())
+        
+    Returns
+    -------
+    list of str
+        De-duplicated IDs
+    """
+    seen: Set[str] = set()
+    out: List[str] = []
+    for x in ids:
+        s = str(x).strip()
+        if s and s not in seen:
+            seen.add(s)
+            out.append(s)
+    return out
+
+
+def filter_or(field: str, vals: Iterable[str]) -> str:
+    """
+    Build an OData OR filter matching `field` against each value.
+    
+    Examples
+    --------
+    >>> filter_or("ForceElementOrgID", ["1", "2"])
+    "ForceElementOrgID eq '1' or ForceElementOrgID eq '2'"
+    """
+    esc = escape_odata_literal
+    prefix = f"{field} eq '"
+    return " or ".join([prefix + esc(v) + "'" for v in vals])
+
+
+def iter_rows_for_ids(
+    svc: ODataService,
+    ids: List[str],
+    *,
+    select: str,
+    sap_client: Optional[str] = None,
+    chunk_size: int = 40,
+    active_only: bool = False,
+    fetch_all_threshold: int = FETCH_ALL_THRESHOLD,
+    caller: str = "bulk",
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield Force Element rows whose ID is in `ids`.
+    
+    Small ID lists are read in OR-filter chunks. Above `fetch_all_threshold`
+    IDs the filters alone would run to megabytes across hundreds of requests,
+    so a single read of all rows is issued instead and filtered client-side;
+    IDs it could not cover (read truncated at FETCH_ALL_TOP rows, or failed)
+    are then read in chunks. Failed requests are logged and skipped.
+    
+    Parameters
+    ----------
+    svc : ODataService
+        Force Element service
+    ids : list of str
+        Normalized IDs (see norm_ids)
+    select : str
+        $select clause (must include ID_FIELD)
+    sap_client : str, optional
+        SAP client override
+    chunk_size : int
+        IDs per OR-filter chunk
+    active_only : bool
+        Restrict reads to active entities
+    fetch_all_threshold : int
+        ID count above which to fetch all rows (0 disables)
+    caller : str
+        Name used in log messages
+        
+    Yields
+    ------
+    dict
+        Matching entity rows
+    """
+    if fetch_all_threshold and len(ids) > fetch_all_threshold:
+        id_set = set(ids)
+        found: Set[str] = set()
+        n_rows = 0
+        complete = False
+        logger.debug(f"{caller}: {len(ids)} ids > {fetch_all_threshold}, fetching all")
+        query = {"$select": select, "$top": str(FETCH_ALL_TOP)}
+        if active_only:
+            query["$filter"] = "IsActiveEntity eq true"
+        try:
+            for r in svc.read_all_iter(
+                ES_FORCE_ELEMENT_TP,
+                sap_client=sap_client,
+                prefetch=True,
+                **query
+            ):
+                n_rows += 1
+                fe_id = str(r.get(ID_FIELD) or "").strip()
+                if fe_id in id_set:
+                    found.add(fe_id)
+                    yield r
+            complete = n_rows < FETCH_ALL_TOP
+        except ODataUpstreamError as e:
+            logger.warning(f"{caller}: fetch-all failed status={e.status}")
+        if complete:
+            return
+        # Truncated at $top (or failed): read the IDs not seen yet by chunks
+        ids = [x for x in ids if x not in found]
+        if n_rows >= FETCH_ALL_TOP:
+            logger.warning(
+                f"{caller}: fetch-all hit $top={FETCH_ALL_TOP}, "
+                f"re-reading {len(ids)} missing ids in chunks"
+            )
+        
+    for group in chunks(ids, int(chunk_size)):
+        flt = filter_or(ID_FIELD, group)
+        if active_only:
+            flt = f"({flt}) and (IsActiveEntity eq true)"
+            
+        try:
+            # Drained inside the try: a page cut off mid-stream raises while
+            # iterating, and the whole chunk is skipped like a failed request
+            rows = list(svc.stream_read(
+                ES_FORCE_ELEMENT_TP,
+                sap_client=sap_client,
+                **{
+                    "$select": select,
+                    "$filter": flt,
+                }
+            ))
+        except ODataUpstreamError as e:
+            logger.warning(f"{caller}: error status={e.status}")
+            continue
+            
+        yield from rows
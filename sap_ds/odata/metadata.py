@@ -7,12 +7,41 @@ Lightweight $metadata parser for OData v2/v4 services.
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional, Tuple
+import contextlib
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import weakref
 import xml.etree.ElementTree as ET
 
 from sap_ds.core.session import SAPODataSession
 
+logger = logging.getLogger("sap_ds.odata")
+
+# Directory for the persistent parsed-$metadata cache (disabled when unset)
+META_CACHE_DIR_ENV = "ODATA_META_CACHE_DIR"
+
+# Seconds before a shared instance re-fetches $metadata (default: 900)
+META_TTL_ENV = "ODATA_META_TTL"
+
+# Process-wide shared instances: (base_url, service, sap_client, auth) -> metadata.
+# Least recently used services are evicted beyond the cap.
+_META_CACHE_MAX = 256
+_META_CACHE: "OrderedDict[Tuple[str, str, str, str], ODataMetadata]" = OrderedDict()
+_META_CACHE_LOCK = threading.Lock()
+
+# Bound on memoized validate_select results per metadata instance
+_VALIDATED_MAX = 4096
+
 
 @dataclass
 class EntitySetInfo:
@@ -33,11 +62,6 @@ class EntitySetInfo:
     properties: List[str]
 
 
-def _strip_ns(tag: str) -> str:
-    """Strip XML namespace from a tag name."""
-    return tag.split("}", 1)[-1] if "}" in tag else tag
-
-
 class ODataMetadata:
     """
     Lightweight $metadata parser for OData v2/v4.
@@ -48,11 +72,19 @@ class ODataMetadata:
     Parameters
     ----------
     sess : SAPODataSession
-        Active OData session
+        Active OData session. Held by weak reference, so the metadata never
+        keeps a session alive; accessors also take the session to use.
     service : str
         Service name
     sap_client : str, optional
         SAP client override
+    cache_dir : str, optional
+        Directory for a persistent cache of the parsed metadata, revalidated
+        with ETag/Last-Modified on refresh. Defaults to $ODATA_META_CACHE_DIR;
+        no disk cache when neither is set.
+    ttl : float, optional
+        Seconds after which the parsed metadata is refreshed on next access
+        (default: never)
         
     Examples
     --------
@@ -68,69 +100,294 @@ class ODataMetadata:
         sess: SAPODataSession,
         service: str,
         *,
-        sap_client: Optional[str] = None
+        sap_client: Optional[str] = None,
+        cache_dir: Optional[str] = None,
+        ttl: Optional[float] = None,
     ):
-        self.sess = sess
+        self._sess_ref = weakref.ref(sess)
         self.service = service
         self.sap_client = sap_client
+        self.ttl = ttl
+        self._loaded_at = 0.0
+        # (ETag, Last-Modified) the current parse was served with
+        self._validators: Tuple[Optional[str], Optional[str]] = (None, None)
+        # Serializes (re)fetches so concurrent callers don't parse twice
+        self._refresh_lock = threading.Lock()
         self._entity_sets: Dict[str, EntitySetInfo] = {}
+        self._prop_sets: Dict[str, FrozenSet[str]] = {}
+        self._validated: Dict[
+            Tuple[str, Tuple[str, ...]], Tuple[Tuple[str, ...], Tuple[str, ...]]
+        ] = {}
+        
+        cache_dir = cache_dir or os.environ.get(META_CACHE_DIR_ENV)
+        self._cache_path: Optional[Path] = None
+        if cache_dir:
+            client = sap_client or getattr(sess.cfg, "default_sap_client", None) or ""
+            key = hashlib.sha1(f"{sess.base}|{service}|{client}".encode()).hexdigest()
+            self._cache_path = Path(cache_dir) / f"odata_meta_{key}.json"
+
+    @property
+    def sess(self) -> Optional[SAPODataSession]:
+        """Session given at construction, or None once it was garbage collected."""
+        return self._sess_ref()
+
+    @classmethod
+    def get(
+        cls,
+        sess: SAPODataSession,
+        service: str,
+        *,
+        sap_client: Optional[str] = None,
+        ttl: Optional[float] = None,
+    ) -> "ODataMetadata":
+        """
+        Return the process-wide metadata instance for a service.
+        
+        Services on the same endpoint, client and credentials share one
+        parsed $metadata, so short-lived ODataService objects do not
+        re-download and re-parse it. The shared copy is refreshed lazily
+        once older than `ttl`; pass your session to the accessors so the
+        refresh runs on it. Up to 256 services are kept, least recently
+        used first out.
+        
+        Parameters
+        ----------
+        sess : SAPODataSession
+            Active OData session
+        service : str
+            Service name
+        sap_client : str, optional
+            SAP client override
+        ttl : float, optional
+            Refresh interval in seconds; applied to the shared instance when
+            given (default for new instances: $ODATA_META_TTL or 900)
+            
+        Returns
+        -------
+        ODataMetadata
+            Shared (lazily parsed) metadata instance
+        """
+        client = sap_client or getattr(sess.cfg, "default_sap_client", None) or ""
+        key = (sess.base, service, client, sess._auth_id())
+        with _META_CACHE_LOCK:
+            meta = _META_CACHE.get(key)
+            if meta is None:
+                if ttl is None:
+                    ttl = float(os.environ.get(META_TTL_ENV) or 900)
+                meta = cls(sess, service, sap_client=client or None, ttl=ttl)
+                _META_CACHE[key] = meta
+                while len(_META_CACHE) > _META_CACHE_MAX:
+                    _META_CACHE.popitem(last=False)
+            else:
+                _META_CACHE.move_to_end(key)
+                if ttl is not None:
+                    meta.ttl = ttl
+            return meta
+
+    @staticmethod
+    def clear_cache() -> None:
+        """Drop all shared instances created by ODataMetadata.get()."""
+        with _META_CACHE_LOCK:
+            _META_CACHE.clear()
 
-    def refresh(self) -> None:
+    def _load_cache(self) -> Optional[Dict]:
+        if self._cache_path is None:
+            return None
+        try:
+            with open(self._cache_path, "r", encoding="utf-8") as f:
+                doc = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return doc if isinstance(doc, dict) else None
+
+    def _save_cache(self, validators: Dict[str, Optional[str]]) -> None:
+        if self._cache_path is None:
+            return
+        doc = {
+            **validators,
+            "entity_sets": [asdict(info) for info in self._entity_sets.values()],
+        }
+        try:
+            self._cache_path.parent.mkdir(parents=True, exist_ok=True)
+            # Unique temp file per writer: workers sharing the cache directory
+            # must not interleave writes into one file before the replace
+            fd, tmp = tempfile.mkstemp(
+                dir=self._cache_path.parent, prefix=f"{self._cache_path.name}.", suffix=".tmp"
+            )
+        except OSError as e:
+            logger.debug(f"metadata cache write failed for {self.service}: {e}")
+            return
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(doc, f)
+            os.replace(tmp, self._cache_path)
+        except OSError as e:
+            logger.debug(f"metadata cache write failed for {self.service}: {e}")
+            with contextlib.suppress(OSError):
+                os.unlink(tmp)
+
+    def refresh(self, sess: Optional[SAPODataSession] = None) -> None:
         """
         Fetch and parse $metadata from the service.
         
-        Called automatically on first access to entity_sets() or properties().
+        Called automatically on first access to entity_sets() or properties(),
+        and again once older than `ttl`. Requests are conditional on the
+        ETag/Last-Modified of the current parse (or the disk cache entry), so
+        a 304 Not Modified reuses the parsed entity sets without re-parsing.
+        
+        Parameters
+        ----------
+        sess : SAPODataSession, optional
+            Session to fetch with (default: the one given at construction)
         """
-        xml_text = self.sess.get_text(self.service, "$metadata", sap_client=self.sap_client)
-        root = ET.fromstring(xml_text)
+        sess = sess or self.sess
+        if sess is None:
+            raise ValueError(
+                f"No live session to fetch $metadata for {self.service}; pass sess="
+            )
+        # Revalidate the parse held in memory, or on first load the disk
+        # cache entry, with the ETag/Last-Modified it was served with
+        etag, last_modified = self._validators
+        cached: Dict = {}
+        if not self._entity_sets:
+            cached = self._load_cache() or {}
+            etag, last_modified = cached.get("etag"), cached.get("last_modified")
+            
+        xml_text, headers = sess.get_text_conditional(
+            self.service, "$metadata",
+            sap_client=self.sap_client,
+            etag=etag,
+            last_modified=last_modified,
+        )
+        if xml_text is None and self._entity_sets:
+            # 304: the entity sets already parsed are current
+            self._loaded_at = time.monotonic()
+            return
+        if xml_text is None and cached.get("entity_sets"):
+            try:
+                entity_sets = {
+                    d["name"]: EntitySetInfo(**d) for d in cached["entity_sets"]
+                }
+            except (TypeError, KeyError, AttributeError) as e:
+                logger.debug(f"metadata cache entry for {self.service} is malformed: {e!r}")
+            else:
+                self._set_entity_sets(entity_sets)
+                self._validators = (etag, last_modified)
+                return
+        if xml_text is None:
+            # 304 without a usable parse: fetch unconditionally
+            xml_text = sess.get_text(self.service, "$metadata", sap_client=self.sap_client)
+            headers = {}
+            
+        self._parse(xml_text)
+        self._validators = (headers.get("ETag"), headers.get("Last-Modified"))
+        if any(self._validators):
+            self._save_cache({
+                "etag": self._validators[0],
+                "last_modified": self._validators[1],
+            })
 
-        # Collect EntityType -> properties
+    def _parse(self, xml_text: str) -> None:
+        # Single streaming pass; EntityType subtrees are freed once read.
+        # EntitySets may precede their EntityType, so resolve them at the end.
+        # Tags are matched as precomputed Clark names ("{ns}Local"), one set
+        # lookup per element. The EDM namespace is not the root (edmx) one
+        # and differs by OData version, so add each namespace as declared.
+        et_tags = {"EntityType"}
+        es_tags = {"EntitySet"}
+        prop_tags = {"Property"}
+        
         entity_props: Dict[str, List[str]] = {}
-        for node in root.iter():
-            if _strip_ns(node.tag) == "EntityType":
+        raw_sets: List[Tuple[str, str]] = []
+        events = ("start-ns", "end")
+        for event, node in ET.iterparse(io.StringIO(xml_text), events=events):
+            if event == "start-ns":
+                ns = "{" + node[1] + "}"
+                et_tags.add(ns + "EntityType")
+                es_tags.add(ns + "EntitySet")
+                prop_tags.add(ns + "Property")
+                continue
+            tag = node.tag
+            if tag in et_tags:
                 et_name = node.attrib.get("Name")
-                if not et_name:
-                    continue
-                props: List[str] = []
-                for c in node:
-                    if _strip_ns(c.tag) == "Property":
-                        pname = c.attrib.get("Name")
-                        if pname:
-                            props.append(pname)
-                entity_props[et_name] = props
-
-        # Find EntitySets in EntityContainer
-        entity_sets: Dict[str, EntitySetInfo] = {}
-        for node in root.iter():
-            if _strip_ns(node.tag) == "EntitySet":
+                if et_name:
+                    props: List[str] = []
+                    for c in node:
+                        if c.tag in prop_tags:
+                            pname = c.attrib.get("Name")
+                            if pname:
+                                props.append(pname)
+                    entity_props[et_name] = props
+                node.clear()
+            elif tag in es_tags:
                 es_name = node.attrib.get("Name")
                 et_full = node.attrib.get("EntityType")
-                if not es_name or not et_full:
-                    continue
-                et_name = et_full.split(".")[-1]
-                props = entity_props.get(et_name, [])
-                entity_sets[es_name] = EntitySetInfo(
-                    name=es_name,
-                    entity_type=et_full,
-                    properties=props
-                )
+                if es_name and et_full:
+                    raw_sets.append((es_name, et_full))
+                node.clear()
+            elif tag not in prop_tags:
+                # Annotations, associations, function imports, ...: nothing
+                # to read, so free each subtree as soon as it is complete.
+                # Properties are kept for their EntityType to read.
+                node.clear()
 
+        entity_sets: Dict[str, EntitySetInfo] = {}
+        for es_name, et_full in raw_sets:
+            et_name = et_full.rpartition(".")[2]
+            entity_sets[es_name] = EntitySetInfo(
+                name=es_name,
+                entity_type=et_full,
+                properties=entity_props.get(et_name, [])
+            )
+
+        self._set_entity_sets(entity_sets)
+
+    def _set_entity_sets(self, entity_sets: Dict[str, EntitySetInfo]) -> None:
+        # Property sets are built once per parse; validation results
+        # computed against the previous parse are dropped
         self._entity_sets = entity_sets
+        self._loaded_at = time.monotonic()
+        self._prop_sets = {
+            name: frozenset(info.properties) for name, info in entity_sets.items()
+        }
+        self._validated = {}
+
+    def _stale(self) -> bool:
+        if not self._entity_sets:
+            return True
+        return self.ttl is not None and time.monotonic() - self._loaded_at >= self.ttl
+
+    def _ensure_loaded(self, sess: Optional[SAPODataSession]) -> None:
+        if not self._stale():
+            return
+        with self._refresh_lock:
+            # Another thread may have refreshed while we waited
+            if self._stale():
+                self.refresh(sess)
 
-    def entity_sets(self) -> List[str]:
+    def entity_sets(self, *, sess: Optional[SAPODataSession] = None) -> List[str]:
         """
         Get list of entity set names in the service.
         
+        Parameters
+        ----------
+        sess : SAPODataSession, optional
+            Session to use if metadata must be (re)fetched
+            
         Returns
         -------
         list of str
             Sorted list of entity set names
         """
-        if not self._entity_sets:
-            self.refresh()
+        self._ensure_loaded(sess)
         return sorted(self._entity_sets.keys())
 
-    def properties(self, entity_set: str) -> List[str]:
+    def properties(
+        self,
+        entity_set: str,
+        *,
+        sess: Optional[SAPODataSession] = None,
+    ) -> List[str]:
         """
         Get list of properties for an entity set.
         
@@ -138,21 +395,24 @@ class ODataMetadata:
         ----------
         entity_set : str
             Name of the entity set
+        sess : SAPODataSession, optional
+            Session to use if metadata must be (re)fetched
             
         Returns
         -------
         list of str
             List of property names
         """
-        if not self._entity_sets:
-            self.refresh()
+        self._ensure_loaded(sess)
         info = self._entity_sets.get(entity_set)
         return list(info.properties) if info else []
 
     def validate_select(
         self,
         entity_set: str,
-        fields: List[str]
+        fields: List[str],
+        *,
+        sess: Optional[SAPODataSession] = None,
     ) -> Tuple[List[str], List[str]]:
         """
         Validate fields against entity set metadata.
@@ -163,19 +423,34 @@ class ODataMetadata:
             Name of the entity set
         fields : list of str
             Field names to validate
+        sess : SAPODataSession, optional
+            Session to use if metadata must be (re)fetched
             
         Returns
         -------
         tuple of (list, list)
             (valid_fields, unknown_fields)
         """
-        props = set(self.properties(entity_set))
-        valid, unknown = [], []
-        for f in fields:
-            (valid if f in props else unknown).append(f)
-        return valid, unknown
+        self._ensure_loaded(sess)
+        key = (entity_set, tuple(fields))
+        hit = self._validated.get(key)
+        if hit is None:
+            props = self._prop_sets.get(entity_set, frozenset())
+            valid, unknown = [], []
+            for f in fields:
+                (valid if f in props else unknown).append(f)
+            hit = (tuple(valid), tuple(unknown))
+            if len(self._validated) >= _VALIDATED_MAX:
+                self._validated.clear()
+            self._validated[key] = hit
+        return list(hit[0]), list(hit[1])
     
-    def get_entity_set_info(self, entity_set: str) -> Optional[EntitySetInfo]:
+    def get_entity_set_info(
+        self,
+        entity_set: str,
+        *,
+        sess: Optional[SAPODataSession] = None,
+    ) -> Optional[EntitySetInfo]:
         """
         Get detailed info about an entity set.
         
@@ -183,12 +458,13 @@ class ODataMetadata:
         ----------
         entity_set : str
             Name of the entity set
+        sess : SAPODataSession, optional
+            Session to use if metadata must be (re)fetched
             
         Returns
         -------
         EntitySetInfo or None
             Entity set info if found
         """
-        if not self._entity_sets:
-            self.refresh()
+        self._ensure_loaded(sess)
         return self._entity_sets.get(entity_set)
@@ -7,16 +7,30 @@ Service-scoped query client for SAP OData services.
 
 from __future__ import annotations
 
-from typing import Any, Dict, Generator, List, Optional, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import chain
+from typing import Any, Dict, Generator, Iterator, List, Optional, Sequence, Set
+from urllib.parse import parse_qs, urlsplit
 
-from sap_ds.core.session import SAPODataSession
+# Optional: incremental JSON parsing for large pages
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+from sap_ds.core.session import SAPODataSession, _decode_json
 from sap_ds.odata.metadata import ODataMetadata
 
 
+@lru_cache(maxsize=100_000)
 def escape_odata_literal(value: str) -> str:
     """
     Escape a string value for use in OData $filter expressions.
     
+    Memoized: the same IDs recur across the name, readiness and SIDC
+    bulk fetches for one tree.
+    
     Parameters
     ----------
     value : str
@@ -40,6 +54,22 @@ def _join_csv(items: Sequence[str]) -> str:
     return ",".join([s.strip() for s in items if s and s.strip()])
 
 
+def _next_link_key(next_link: str) -> Any:
+    """
+    Identify a __next link by its paging cursor.
+    
+    Uses (path, $skiptoken or $skip) so cycle detection keys on the short
+    varying part and is not fooled by re-ordered or re-encoded parameters;
+    links without a cursor fall back to the full URL.
+    """
+    parts = urlsplit(next_link)
+    q = parse_qs(parts.query)
+    cursor = q.get("$skiptoken") or q.get("$skip")
+    if cursor:
+        return (parts.path, cursor[0])
+    return next_link
+
+
 class ODataService:
     """
     Service-scoped OData query client.
@@ -55,6 +85,9 @@ class ODataService:
         Service technical name
     default_sap_client : str, optional
         Default SAP client override
+    meta_ttl : float, optional
+        Seconds before the shared $metadata is refreshed (default:
+        $ODATA_META_TTL or 900)
         
     Examples
     --------
@@ -79,11 +112,14 @@ class ODataService:
         service: str,
         *,
         default_sap_client: Optional[str] = None,
+        meta_ttl: Optional[float] = None,
     ) -> None:
         self.sess = sess
         self.service = service
         self.default_sap_client = default_sap_client
-        self.meta = ODataMetadata(sess, service, sap_client=default_sap_client)
+        self.meta = ODataMetadata.get(
+            sess, service, sap_client=default_sap_client, ttl=meta_ttl
+        )
 
     # ---------------- core reads ----------------
 
@@ -119,12 +155,62 @@ class ODataService:
         )
         return payload.get("d", {}).get("results") or payload.get("value") or []
 
+    def stream_read(
+        self,
+        entity_set: str,
+        *,
+        sap_client: Optional[str] = None,
+        **query: str
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Read a single page of results as an iterator of records.
+        
+        With ``ijson`` installed the response is parsed straight off the
+        socket, so peak memory stays near one record instead of the whole
+        page. Without it this falls back to read(). The request itself is
+        sent immediately, so upstream errors are raised by this call.
+        
+        Parameters
+        ----------
+        entity_set : str
+            Entity set name
+        sap_client : str, optional
+            SAP client override
+        **query
+            Additional OData query parameters
+            
+        Returns
+        -------
+        iterator of dict
+            Entity records (OData v2 ``d.results``)
+        """
+        if ijson is None:
+            return iter(self.read(entity_set, sap_client=sap_client, **query))
+
+        return self.sess.iter_get(
+            self.service,
+            entity_set,
+            params=query,
+            sap_client=sap_client or self.default_sap_client
+        )
+
+    def _fetch_next(self, next_link: str) -> Dict[str, Any]:
+        """GET an absolute __next link and return the parsed page."""
+        r = self.sess.session.get(
+            next_link,
+            timeout=self.sess.timeout,
+            verify=self.sess.verify
+        )
+        self.sess._raise_for_error(r, next_link)
+        return _decode_json(r)
+
     def iterate(
         self,
         entity_set: str,
         *,
         sap_client: Optional[str] = None,
         max_pages: Optional[int] = None,
+        prefetch: bool = False,
         **query: str,
     ) -> Generator[List[Dict[str, Any]], None, None]:
         """
@@ -140,6 +226,10 @@ class ODataService:
             SAP client override
         max_pages : int, optional
             Maximum number of pages to fetch
+        prefetch : bool
+            Request the next page in a background thread while the caller
+            processes the current one. Skip tokens are server-driven, so at
+            most one page can be in flight ahead of the consumer.
         **query
             Additional OData query parameters
             
@@ -152,37 +242,62 @@ class ODataService:
         p = self.sess.get(self.service, entity_set, params=query, sap_client=sap)
 
         yielded = 0
-        first = p.get("d", {}).get("results") or p.get("value") or []
-        if first:
-            yield first
-            yielded += 1
-            if max_pages is not None and yielded >= int(max_pages):
-                return
-
-        next_link = p.get("d", {}).get("__next") or p.get("@odata.nextLink")
         seen = set()
+        pool = ThreadPoolExecutor(max_workers=1) if prefetch else None
+
+        try:
+            while True:
+                chunk = p.get("d", {}).get("results") or p.get("value") or []
+                next_link = p.get("d", {}).get("__next") or p.get("@odata.nextLink")
+                link_key = _next_link_key(next_link) if next_link else None
+                if link_key in seen:
+                    next_link = None
+                last = bool(chunk) and max_pages is not None and yielded + 1 >= int(max_pages)
+
+                pending = None
+                if next_link and not last:
+                    seen.add(link_key)
+                    if pool is not None:
+                        pending = pool.submit(self._fetch_next, next_link)
 
-        while next_link:
-            if next_link in seen:
-                return
-            seen.add(next_link)
-
-            r = self.sess.session.get(
-                next_link,
-                timeout=self.sess.timeout,
-                verify=self.sess.verify
-            )
-            self.sess._raise_for_error(r, next_link)
-            p = r.json()
-
-            chunk = p.get("d", {}).get("results") or p.get("value") or []
-            if chunk:
-                yield chunk
-                yielded += 1
-                if max_pages is not None and yielded >= int(max_pages):
+                if chunk:
+                    yield chunk
+                    yielded += 1
+                if last or not next_link:
                     return
 
-            next_link = p.get("d", {}).get("__next") or p.get("@odata.nextLink")
+                p = pending.result() if pending is not None else self._fetch_next(next_link)
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+
+    def read_all_iter(
+        self,
+        entity_set: str,
+        *,
+        sap_client: Optional[str] = None,
+        max_pages: Optional[int] = None,
+        prefetch: bool = False,
+        **query: str,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over records across all pages without collecting them.
+        
+        Lazy: nothing is requested until iteration starts, and upstream
+        errors surface while iterating. Parameters are as for read_all().
+        
+        Yields
+        ------
+        dict
+            Each entity record, in page order
+        """
+        return chain.from_iterable(self.iterate(
+            entity_set,
+            sap_client=sap_client,
+            max_pages=max_pages,
+            prefetch=prefetch,
+            **query
+        ))
 
     def read_all(
         self,
@@ -190,6 +305,7 @@ class ODataService:
         *,
         sap_client: Optional[str] = None,
         max_pages: Optional[int] = None,
+        prefetch: bool = False,
         **query: str,
     ) -> List[Dict[str, Any]]:
         """
@@ -203,6 +319,8 @@ class ODataService:
             SAP client override
         max_pages : int, optional
             Maximum number of pages to fetch
+        prefetch : bool
+            Fetch the next page while the current one is processed
         **query
             Additional OData query parameters
             
@@ -211,15 +329,13 @@ class ODataService:
         list of dict
             All entity records across pages
         """
-        out: List[Dict[str, Any]] = []
-        for page in self.iterate(
+        return list(self.read_all_iter(
             entity_set,
             sap_client=sap_client,
             max_pages=max_pages,
+            prefetch=prefetch,
             **query
-        ):
-            out.extend(page)
-        return out
+        ))
 
     # ---------------- generic query builder ----------------
 
@@ -292,7 +408,7 @@ class ODataService:
         if fields:
             use_fields = fields
             if validate_fields:
-                valid, unknown = self.meta.validate_select(entity_set, fields)
+                valid, unknown = self.meta.validate_select(entity_set, fields, sess=self.sess)
                 use_fields = valid
                 # Unknown fields are silently dropped (can be logged if needed)
             if use_fields:
@@ -327,7 +443,7 @@ class ODataService:
         list of str
             Entity set names
         """
-        return self.meta.entity_sets()
+        return self.meta.entity_sets(sess=self.sess)
 
     def list_fields(self, entity_set: str) -> List[str]:
         """
@@ -343,4 +459,23 @@ class ODataService:
         list of str
             Field/property names
         """
-        return self.meta.properties(entity_set)
+        return self.meta.properties(entity_set, sess=self.sess)
+
+    def get_properties(self, entity_set: str) -> Set[str]:
+        """
+        Get the property names of an entity set as a set.
+        
+        Served from the cached $metadata, so membership checks need no
+        extra HTTP round-trip.
+        
+        Parameters
+        ----------
+        entity_set : str
+            Entity set name
+            
+        Returns
+        -------
+        set of str
+            Field/property names (empty if the entity set is unknown)
+        """
+        return set(self.meta.properties(entity_set, sess=self.sess))
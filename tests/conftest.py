@@ -6,6 +6,16 @@ import pytest
 from unittest.mock import Mock, MagicMock
 from typing import Any, Dict, List
 
+from sap_ds.odata.metadata import ODataMetadata
+
+
+@pytest.fixture(autouse=True)
+def _clear_metadata_cache():
+    """Isolate tests from process-wide shared $metadata instances."""
+    ODataMetadata.clear_cache()
+    yield
+    ODataMetadata.clear_cache()
+
 
 @pytest.fixture
 def mock_session():
@@ -17,6 +27,10 @@ def mock_session():
     session.timeout = 60.0
     session.verify = True
     session.session = Mock()
+    # Without validators a conditional GET is a plain GET
+    session.get_text_conditional = Mock(side_effect=lambda service, path, **kw: (
+        session.get_text(service, path, sap_client=kw.get("sap_client")), {}
+    ))
     return session
 
 
@@ -2,7 +2,10 @@
 Tests for sap_ds.core module.
 """
 
+import json
+
 import pytest
+from requests.utils import DEFAULT_ACCEPT_ENCODING
 from unittest.mock import Mock, patch, MagicMock
 
 from sap_ds.core.session import (
@@ -108,6 +111,339 @@ class TestSAPODataSession:
         sess = SAPODataSession(cfg)
         mock_session.headers.update.assert_called()
     
+    def test_session_requests_compression(self):
+        cfg = ODataConfig(
+            base_url="https://test.com/odata",
+            auth=ODataAuth("basic", ("user", "pass")),
+        )
+        
+        with SAPODataSession(cfg) as sess:
+            # requests' default offers every encoding urllib3 can decode
+            assert sess.session.headers["Accept-Encoding"] == DEFAULT_ACCEPT_ENCODING
+            assert "gzip" in sess.session.headers["Accept-Encoding"]
+    
+    def test_default_params_built_once(self):
+        cfg = ODataConfig(
+            base_url="https://test.com/odata",
+            auth=ODataAuth("basic", ("user", "pass")),
+            default_sap_client="100",
+        )
+        
+        with SAPODataSession(cfg) as sess:
+            assert sess._params() is sess._params()
+            assert sess._params() == {"$format": "json", "sap-client": "100"}
+            assert sess._params({"$top": "1"}, "200") == {
+                "$format": "json", "sap-client": "200", "$top": "1"
+            }
+            assert sess._params() == {"$format": "json", "sap-client": "100"}
+            assert sess._params(None, "", include_format=False) == {}
+    
+    def test_json_or_text_decodes_bytes_and_falls_back(self):
+        cfg = ODataConfig(
+            base_url="https://test.com/odata",
+            auth=ODataAuth("basic", ("user", "pass")),
+        )
+        body = {"d": {"results": [{"ID": "ä"}]}}
+        
+        with SAPODataSession(cfg) as sess:
+            ctype = {"Content-Type": "application/json"}
+            utf8 = _response(200, ctype, json.dumps(body).encode("utf-8"))
+            utf16 = _response(200, ctype, json.dumps(body).encode("utf-16"))
+            xml = _response(200, {"Content-Type": "application/xml"}, b"<x/>")
+            
+            assert sess._json_or_text(utf8) == body
+            assert sess._json_or_text(utf16) == body
+            assert sess._json_or_text(xml)["raw"] == "<x/>"
+    
+    def test_url_joins_cached_service_base(self):
+        cfg = ODataConfig(
+            base_url="https://test.com/odata",
+            auth=ODataAuth("basic", ("user", "pass")),
+        )
+        
+        with SAPODataSession(cfg) as sess:
+            assert sess._url("/SRV/", "/Items") == "https://test.com/odata/SRV/Items"
+            assert sess._url("/SRV/", "$metadata") == "https://test.com/odata/SRV/$metadata"
+            assert sess._service_base("/SRV/") is sess._service_base("/SRV/")
+    
+    def test_extract_sap_error_formats_known_fields(self):
+        cfg = ODataConfig(
+            base_url="https://test.com/odata",
+            auth=ODataAuth("basic", ("user", "pass")),
+        )
+        ctype = {"Content-Type": "application/json"}
+        full = {"error": {
+            "code": "SY/530",
+            "message": {"lang": "en", "value": "Not found"},
+            "innererror": {"transactionid": "ABC", "timestamp": "2024"},
+        }}
+        
+        with SAPODataSession(cfg) as sess:
+            assert sess._extract_sap_error(_response(404, ctype, json.dumps(full).encode())) == (
+                "code=SY/530 | message=Not found | txid=ABC | ts=2024"
+            )
+            plain = {"error": {"message": "boom", "innererror": "n/a"}}
+            assert sess._extract_sap_error(
+                _response(500, ctype, json.dumps(plain).encode())
+            ) == "message=boom"
+            assert sess._extract_sap_error(_response(500, ctype, b'{"error": {}}')) == '{"error": {}}'
+    
+    def test_session_pool_sizes_from_config(self):
+        cfg = ODataConfig(
+            base_url="https://test.com/odata",
+            auth=ODataAuth("basic", ("user", "pass")),
+            pool_maxsize=8,
+        )
+        
+        with SAPODataSession(cfg) as sess:
+            adapter = sess.session.get_adapter("https://test.com/odata/")
+            assert adapter._pool_maxsize == 8
+            assert adapter._pool_connections == 20
+    
+    def test_pooled_sockets_use_nodelay_and_keepalive(self):
+        import socket
+        
+        cfg = ODataConfig(
+            base_url="https://test.com/odata",
+            auth=ODataAuth("basic", ("user", "pass")),
+        )
+        
+        with SAPODataSession(cfg) as sess:
+            adapter = sess.session.get_adapter("https://test.com/odata/")
+            opts = adapter.poolmanager.connection_pool_kw["socket_options"]
+            assert (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1) in opts
+            assert (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1) in opts
+    
+    def test_session_shards_spread_threads_and_share_cookies(self):
+        import threading
+        
+        cfg = ODataConfig(
+            base_url="https://test.com/odata",
+            auth=ODataAuth("basic", ("user", "pass")),
+            session_shards=2,
+        )
+        
+        with SAPODataSession(cfg) as sess:
+            picked = []
+            threads = [
+                threading.Thread(target=lambda: picked.append(sess.session))
+                for _ in range(2)
+            ]
+            for t in threads:
+                t.start()
+                t.join()
+            
+            assert picked[0] is not picked[1]
+            assert sess.session is sess.session
+            picked[0].cookies.set("SAP_SESSIONID", "abc")
+            assert picked[1].cookies.get("SAP_SESSIONID") == "abc"
+    
+    def test_writes_retried_once_and_only_when_rejected(self):
+        cfg = ODataConfig(
+            base_url="https://test.com/odata",
+            auth=ODataAuth("basic", ("user", "pass")),
+        )
+        
+        from urllib3 import HTTPResponse
+        
+        with SAPODataSession(cfg) as sess:
+            retry = sess.session.get_adapter("https://test.com").max_retries
+            
+            assert retry.is_retry("GET", 500)
+            assert not retry.is_retry("POST", 500)
+            assert retry.is_retry("POST", 503)
+            retried = retry.increment("POST", "/x", response=HTTPResponse(status=503))
+            assert not retried.is_retry("POST", 503)
+            assert retried.is_retry("GET", 503)
+    
+    def test_requests_merge_session_headers_with_deltas(self):
+        cfg = ODataConfig(
+            base_url="https://test.com/odata",
+            auth=ODataAuth("basic", ("user", "pass")),
+        )
+        
+        with SAPODataSession(cfg) as sess:
+            adapter = sess.session.get_adapter("https://test.com")
+            adapter.send = Mock(return_value=_response(200, {"Content-Type": "application/json"}))
+            
+            sess.get("SRV", "Items", extra_headers={"X-Trace": "1"})
+            sess.get("SRV", "$metadata")
+            
+            plain, meta = [c.args[0].headers for c in adapter.send.call_args_list]
+            assert plain["X-Trace"] == "1"
+            assert plain["Accept"] == "application/json"
+            assert plain["sap-language"] == "EN"
+            assert meta["Accept"] == "application/xml"
+            assert "X-Trace" not in meta
+    
+    def test_iter_get_without_ijson_falls_back_to_get(self):
+        cfg = ODataConfig(
+            base_url="https://test.com/odata",
+            auth=ODataAuth("basic", ("user", "pass")),
+        )
+        body = {"d": {"results": [{"ID": "1"}, {"ID": "2"}]}}
+        
+        with SAPODataSession(cfg) as sess:
+            sess.session.request = Mock(return_value=_response(
+                200, {"Content-Type": "application/json"}, json.dumps(body).encode()
+            ))
+            with patch("sap_ds.core.session.ijson", None):
+                rows = sess.iter_get("SRV", "Items", {"$top": "2"})
+            
+            sess.session.request.assert_called_once()
+            assert sess.session.request.call_args.kwargs["stream"] is False
+            assert [r["ID"] for r in rows] == ["1", "2"]
+    
+    def test_iter_get_truncated_stream_raises(self):
+        pytest.importorskip("ijson")
+        import io
+        cfg = ODataConfig(
+            base_url="https://test.com/odata",
+            auth=ODataAuth("basic", ("user", "pass")),
+        )
+        truncated = b'{"d": {"results": [{"ID": "1"}, {"ID": "2"}, {"ID": "3'
+        
+        with SAPODataSession(cfg) as sess:
+            resp = _response(200, {"Content-Type": "application/json"})
+            resp.raw = io.BytesIO(truncated)
+            sess.session.request = Mock(return_value=resp)
+            rows = sess.iter_get("SRV", "Items")
+            
+            assert next(rows)["ID"] == "1"
+            with pytest.raises(ODataUpstreamError, match="after 2 rows"):
+                list(rows)
+    
+    @pytest.mark.parametrize("body", [
+        {"d": {"results": [{"ID": "1"}, {"ID": "2"}]}},
+        {"@odata.context": "$metadata#Items", "value": [{"ID": "1"}, {"ID": "2"}]},
+    ])
+    def test_iter_get_streams_v2_and_v4_payloads(self, body):
+        pytest.importorskip("ijson")
+        import io
+        cfg = ODataConfig(
+            base_url="https://test.com/odata",
+            auth=ODataAuth("basic", ("user", "pass")),
+        )
+        raw = json.dumps(body).encode()
+        
+        with SAPODataSession(cfg) as sess:
+            resp = _response(200, {"Content-Type": "application/json"}, raw)
+            resp.raw = io.BytesIO(raw)
+            sess.session.request = Mock(return_value=resp)
+            
+            assert [r["ID"] for r in sess.iter_get("SRV", "Items")] == ["1", "2"]
+            sess.session.request.assert_called_once()
+    
+    def test_get_text_conditional_sends_validators(self):
+        cfg = ODataConfig(
+            base_url="https://test.com/odata",
+            auth=ODataAuth("basic", ("user", "pass")),
+        )
+        
+        with SAPODataSession(cfg) as sess:
+            sess.session.request = Mock(side_effect=[
+                _response(200, {"ETag": '"v1"'}, b"<edmx/>"),
+                _response(304),
+            ])
+            
+            text, headers = sess.get_text_conditional("SRV", "$metadata")
+            assert (text, headers["ETag"]) == ("<edmx/>", '"v1"')
+            assert sess.get_text_conditional("SRV", "$metadata", etag='"v1"')[0] is None
+            
+            first, second = sess.session.request.call_args_list
+            assert "If-None-Match" not in first.kwargs["headers"]
+            assert second.kwargs["headers"]["If-None-Match"] == '"v1"'
+    
+    def test_unknown_transport_rejected(self):
+        cfg = ODataConfig(
+            base_url="https://test.com/odata",
+            auth=ODataAuth("basic", ("user", "pass")),
+            transport="curl",
+        )
+        
+        with pytest.raises(ValueError):
+            SAPODataSession(cfg)
+    
+    def test_httpx_transport_matches_requests_api(self):
+        httpx = pytest.importorskip("httpx")
+        seen = []
+        
+        def handler(request):
+            seen.append(request)
+            if request.method == "POST":
+                return httpx.Response(201, json={"d": {"ID": "9"}})
+            return httpx.Response(
+                200,
+                json={"d": {"results": [{"ID": "1"}]}},
+                headers={"x-csrf-token": "T"},
+            )
+        
+        cfg = ODataConfig(
+            base_url="https://test.com/odata",
+            auth=ODataAuth("basic", ("user", "pass")),
+            default_sap_client="100",
+            transport="httpx",
+        )
+        with patch.object(httpx, "HTTPTransport", lambda **kw: httpx.MockTransport(handler)):
+            sess = SAPODataSession(cfg)
+        
+        with sess:
+            assert sess.get("SRV", "Items", extra_headers={"X-Trace": "1"}) == {
+                "d": {"results": [{"ID": "1"}]}
+            }
+            r = sess.get_stream("SRV", "Items")
+            assert json.loads(r.raw.read(5) + r.raw.read()) == {"d": {"results": [{"ID": "1"}]}}
+            r.close()
+            assert sess.post("SRV", "Items", {"a": 1}) == {"d": {"ID": "9"}}
+        
+        get = seen[0]
+        assert get.url.params["sap-client"] == "100"
+        assert get.headers["X-Trace"] == "1"
+        assert get.headers["sap-language"] == "EN"
+        assert get.headers["Authorization"].startswith("Basic ")
+        assert seen[-1].headers["X-CSRF-Token"] == "T"
+        assert json.loads(seen[-1].content) == {"a": 1}
+    
+    def test_session_pickles_without_connection_state(self):
+        import pickle
+        from sap_ds.core.csrf import MemoryCSRFStore
+        
+        cfg = ODataConfig(
+            base_url="https://test.com/odata",
+            auth=ODataAuth("basic", ("user", "pass")),
+            default_sap_client="100",
+            csrf_store=MemoryCSRFStore(),
+        )
+        
+        with SAPODataSession(cfg) as sess:
+            sess._csrf_tokens["SRV::100"] = "T"
+            sess._url("SRV", "Items")
+            
+            copy = pickle.loads(pickle.dumps(sess))
+            
+            assert copy.session is not sess.session
+            assert copy._csrf_tokens == {}
+            assert copy._params() == {"$format": "json", "sap-client": "100"}
+            assert copy._url("SRV", "Items") == "https://test.com/odata/SRV/Items"
+            assert copy.session.headers["sap-language"] == "EN"
+            copy.close()
+    
+    def test_forked_child_rebuilds_http_session(self):
+        from sap_ds.core import session as session_mod
+        
+        cfg = ODataConfig(
+            base_url="https://test.com/odata",
+            auth=ODataAuth("basic", ("user", "pass")),
+        )
+        
+        with SAPODataSession(cfg) as sess:
+            parent_http = sess.session
+            sess._csrf_tokens["SRV::"] = "T"
+            session_mod._reset_sessions_after_fork()
+            
+            assert sess.session is not parent_http
+            assert sess._csrf_tokens == {}
+    
     @patch("sap_ds.core.session.requests.Session")
     def test_context_manager(self, mock_session_class):
         mock_session = MagicMock()
@@ -124,6 +460,235 @@ class TestSAPODataSession:
         mock_session.close.assert_called_once()
 
 
+def _response(status, headers=None, body=b"{}"):
+    from requests import Response
+    r = Response()
+    r.status_code = status
+    r.headers.update(headers or {})
+    r._content = body
+    return r
+
+
+class TestCSRF:
+    """Tests for CSRF token handling and stores."""
+    
+    def _session(self, store):
+        cfg = ODataConfig(
+            base_url="https://test.com/odata",
+            auth=ODataAuth("basic", ("user", "pass")),
+            csrf_store=store,
+        )
+        return SAPODataSession(cfg)
+    
+    def test_stored_token_and_cookies_reused_by_new_session(self):
+        from sap_ds.core.csrf import MemoryCSRFStore
+        
+        store = MemoryCSRFStore()
+        first = self._session(store)
+        
+        def fetch_then_create(method, url, **kw):
+            if method == "GET":
+                first.session.cookies.set("SAP_SESSIONID", "abc", domain="test.com", path="/")
+                return _response(200, {"x-csrf-token": "T1"})
+            return _response(201)
+        
+        first.session.request = Mock(side_effect=fetch_then_create)
+        first.post("SRV", "Items", {"a": 1})
+        
+        second = self._session(store)
+        second.session.request = Mock(return_value=_response(201))
+        second.post("SRV", "Items", {"a": 2})
+        
+        methods = [c.kwargs["method"] for c in second.session.request.call_args_list]
+        assert methods == ["POST"]
+        assert second.session.request.call_args.kwargs["headers"]["X-CSRF-Token"] == "T1"
+        assert second.session.cookies.get("SAP_SESSIONID") == "abc"
+    
+    @pytest.mark.parametrize("stored", [
+        "{not json",
+        '["token"]',
+        '{"token": "T1", "cookies": {"name": "x"}}',
+        '{"token": "T1", "cookies": [{"value": "abc"}, "junk", {"name": "SAP_SESSIONID"}]}',
+    ])
+    def test_malformed_stored_entry_is_ignored(self, stored):
+        store = Mock()
+        store.get = Mock(return_value=stored)
+        sess = self._session(store)
+        
+        token = sess._load_stored_csrf("SRV", None)
+        
+        assert token in (None, "T1")
+        assert not list(sess.session.cookies)
+    
+    def test_rejected_token_is_refetched_once(self):
+        from sap_ds.core.csrf import MemoryCSRFStore
+        
+        sess = self._session(MemoryCSRFStore())
+        sess._csrf_tokens["SRV::"] = "stale"
+        sess.session.request = Mock(side_effect=[
+            _response(403, {"x-csrf-token": "Required"}, b"CSRF token validation failed"),
+            _response(200, {"x-csrf-token": "T2"}),
+            _response(201),
+        ])
+        
+        sess.post("SRV", "Items", {"a": 1})
+        
+        assert sess.session.request.call_args.kwargs["headers"]["X-CSRF-Token"] == "T2"
+    
+    def test_token_fetched_with_head_then_empty_read(self):
+        sess = self._session(None)
+        sess.session.request = Mock(side_effect=[
+            _response(405),
+            _response(200, {"x-csrf-token": "T3"}),
+            _response(201),
+        ])
+        
+        sess.post("SRV", "Items", {"a": 1})
+        
+        calls = [c.kwargs for c in sess.session.request.call_args_list]
+        assert [c["method"] for c in calls] == ["HEAD", "GET", "POST"]
+        assert calls[1]["url"].endswith("/SRV/Items")
+        assert calls[1]["params"]["$top"] == "0"
+        assert calls[2]["headers"]["X-CSRF-Token"] == "T3"
+    
+    def test_first_writes_to_distinct_services_do_not_serialize(self):
+        import threading
+        
+        sess = self._session(None)
+        b_fetched = threading.Event()
+        
+        def respond(method, url, **kw):
+            if method == "POST":
+                return _response(201)
+            if "/A/" in url:
+                # A's token fetch only completes once B has fetched its own
+                assert b_fetched.wait(5)
+            else:
+                b_fetched.set()
+            return _response(200, {"x-csrf-token": url})
+        
+        sess.session.request = Mock(side_effect=respond)
+        t = threading.Thread(target=sess.post, args=("A", "Items", {}))
+        t.start()
+        sess.post("B", "Items", {})
+        t.join(5)
+        
+        assert not t.is_alive()
+        assert set(sess._csrf_tokens) == {"A::", "B::"}
+    
+    @pytest.mark.parametrize("use_orjson", [True, False])
+    def test_post_sends_compact_json_bytes(self, use_orjson):
+        sess = self._session(None)
+        sess._csrf_tokens["SRV::"] = "T"
+        sess.session.request = Mock(return_value=_response(201))
+        
+        payload = {"Name": "Füsilier", "Qty": 2, "Tags": [None, True]}
+        if use_orjson:
+            sess.post("SRV", "Items", payload)
+        else:
+            with patch("sap_ds.core.session.orjson", None):
+                sess.post("SRV", "Items", payload)
+        
+        body = sess.session.request.call_args.kwargs["data"]
+        assert isinstance(body, bytes)
+        assert json.loads(body) == payload
+        assert b" " not in body
+    
+    def test_batch_get_sends_one_request_per_service(self):
+        sess = self._session(None)
+        sess._csrf_tokens["SRV::"] = "T"
+        batch_body = (
+            b"--resp_1\r\n"
+            b"Content-Type: application/http\r\n"
+            b"Content-Transfer-Encoding: binary\r\n"
+            b"\r\n"
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: application/json\r\n"
+            b"\r\n"
+            b'{"d": {"results": [{"ID": "1"}]}}\r\n'
+            b"--resp_1\r\n"
+            b"Content-Type: application/http\r\n"
+            b"Content-Transfer-Encoding: binary\r\n"
+            b"\r\n"
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: application/json;charset=utf-8\r\n"
+            b"\r\n"
+            b'{"d": {"ID": "2"}}\r\n'
+            b"--resp_1--\r\n"
+        )
+        sess.session.request = Mock(return_value=_response(
+            202, {"Content-Type": "multipart/mixed; boundary=resp_1"}, batch_body
+        ))
+        
+        out = sess.batch_get([
+            ("SRV", "Items", {"$filter": "ID eq '1'", "$top": "1"}),
+            ("SRV", "Items('2')", None),
+        ])
+        
+        assert out == [{"d": {"results": [{"ID": "1"}]}}, {"d": {"ID": "2"}}]
+        call = sess.session.request.call_args.kwargs
+        assert sess.session.request.call_count == 1
+        assert call["url"].endswith("/SRV/$batch")
+        assert call["headers"]["Content-Type"].startswith("multipart/mixed; boundary=batch_")
+        assert b"GET Items?$format=json&$filter=ID%20eq%20'1'&$top=1 HTTP/1.1" in call["data"]
+        assert b"GET Items('2')?$format=json HTTP/1.1" in call["data"]
+    
+    def test_batch_get_raises_for_failed_part(self):
+        sess = self._session(None)
+        sess._csrf_tokens["SRV::"] = "T"
+        batch_body = (
+            b"--b\r\nContent-Type: application/http\r\n\r\n"
+            b"HTTP/1.1 404 Not Found\r\nContent-Type: application/json\r\n\r\n"
+            b'{"error": {}}\r\n--b--\r\n'
+        )
+        sess.session.request = Mock(return_value=_response(
+            202, {"Content-Type": "multipart/mixed; boundary=b"}, batch_body
+        ))
+        
+        with pytest.raises(ODataUpstreamError) as exc:
+            sess.batch_get([("SRV", "Items('x')", None)])
+        assert exc.value.status == 404
+    
+    def test_file_store_roundtrip_and_expiry(self, tmp_path):
+        from sap_ds.core.csrf import FileCSRFStore
+        
+        store = FileCSRFStore(tmp_path / "csrf.json")
+        store.set("k", "v", ttl=60)
+        store.set("old", "x", ttl=-1)
+        
+        assert FileCSRFStore(tmp_path / "csrf.json").get("k") == "v"
+        assert store.get("old") is None
+        store.delete("k")
+        assert store.get("k") is None
+    
+    def test_file_store_writes_private_file_via_unique_temp(self, tmp_path):
+        import stat
+        import tempfile
+        from sap_ds.core.csrf import FileCSRFStore
+        
+        path = tmp_path / "csrf.json"
+        with patch("sap_ds.core.csrf.tempfile.mkstemp", wraps=tempfile.mkstemp) as mkstemp:
+            FileCSRFStore(path).set("k", "v", ttl=60)
+            FileCSRFStore(path).set("j", "w", ttl=60)
+        
+        assert mkstemp.call_count == 2
+        assert stat.S_IMODE(path.stat().st_mode) == 0o600
+        assert [p.name for p in tmp_path.iterdir()] == ["csrf.json"]
+        assert FileCSRFStore(path).get("k") == "v"
+    
+    def test_file_store_skips_malformed_entries(self, tmp_path):
+        from sap_ds.core.csrf import FileCSRFStore
+        
+        path = tmp_path / "csrf.json"
+        path.write_text(json.dumps({"a": {"token": "T", "expires": "soon"}, "b": "junk"}))
+        store = FileCSRFStore(path)
+        
+        assert store.get("a") is None
+        assert store.get("b") is None
+        store.set("k", "v", ttl=60)
+        assert json.loads(path.read_text()).keys() == {"k"}
+
+
 class TestConnectionContext:
     """Tests for ConnectionContext."""
     
@@ -0,0 +1,410 @@
+"""
+Tests for sap_ds.defense.force_elements helpers.
+"""
+
+from unittest.mock import Mock
+
+
+class TestBuildTreeTable:
+    """Tests for build_tree_table."""
+    
+    def test_bfs_order_depth_and_nesting(self):
+        from sap_ds.defense.force_elements import build_tree_table
+        
+        edges = [
+            {"source": "R", "target": "B", "rel": "B002"},
+            {"source": "R", "target": "A", "rel": "b002"},
+            {"source": "R", "target": "A", "rel": "B002"},  # duplicate
+            {"source": "R", "target": "X", "rel": "B001"},  # not structural
+            {"source": "B", "target": "C", "rel": "B002"},
+            {"source": "A", "target": "D", "rel": "B002"},
+            {"source": "D", "target": "E", "rel": "B002"},  # beyond depth
+        ]
+        payload = build_tree_table(
+            "R", edges, {"A": "Alpha"}, depth=2, deeplink_host="host",
+        )
+        
+        tree = payload["tree"]
+        flat = [(n["id"], n["level"], n["parentId"], n["children"]) for n in tree["nodes"]]
+        assert flat == [
+            ("R", 0, None, ["A", "B"]),
+            ("A", 1, "R", ["D"]),
+            ("B", 1, "R", ["C"]),
+            ("C", 2, "B", []),
+            ("D", 2, "A", []),
+        ]
+        assert tree["nodes"][1]["name"] == "Alpha"
+        
+        root = tree["roots"][0]
+        assert [c["id"] for c in root["children"]] == ["A", "B"]
+        assert root["children"][0]["children"][0]["id"] == "D"
+        assert tree["meta"]["depth_reached"] == 2
+        assert tree["meta"]["edge_count_struct"] == 6
+    
+    def test_padded_edge_ids_are_normalised(self):
+        from sap_ds.defense.force_elements import build_tree
+        
+        edges = [
+            {"source": " R ", "target": "A ", "rel": "B002"},
+            {"source": "A", "target": " B", "rel": "B002"},
+        ]
+        payload = build_tree("R", edges, {}, depth=3, deeplink_host="host")
+        
+        flat = [(n["id"], n["parentId"]) for n in payload["tree"]["nodes"]]
+        assert flat == [("R", None), ("A", "R"), ("B", "A")]
+    
+    def test_from_s4_fetches_names_per_level(self, mock_session, monkeypatch):
+        from sap_ds.defense.force_elements import tree as tree_mod
+        
+        def fake_edges(session, root_id, *, depth, sap_client, on_level):
+            on_level([root_id])
+            on_level(["A"])
+            return [{"source": "R", "target": "A", "rel": "B002"}]
+            
+        requested = []
+        
+        def fake_names(session, ids, *, sap_client=None):
+            requested.append(list(ids))
+            return {i: f"name-{i}" for i in ids}
+            
+        monkeypatch.setattr(tree_mod, "fetch_fe_edges_all", fake_edges)
+        monkeypatch.setattr(tree_mod, "fetch_names_for_ids", fake_names)
+        
+        payload = tree_mod.build_tree_from_s4(
+            mock_session, "R", depth=2, deeplink_host="host",
+        )
+        
+        assert sorted(requested) == [["A"], ["R"]]
+        assert [n["name"] for n in payload["tree"]["nodes"]] == ["name-R", "name-A"]
+
+
+class TestApplyToTree:
+    """Tests for applying per-node attributes to tree payloads."""
+    
+    def test_apply_readiness_flat_and_nested(self):
+        from sap_ds.defense.force_elements import apply_readiness_to_tree
+        
+        payload = {
+            "tree": {
+                "nodes": [
+                    {"id": "A", "children": ["B"]},
+                    {"id": "B", "children": []},
+                ],
+                "roots": [
+                    {"id": "A", "children": [{"id": "B", "children": []}]},
+                ],
+            }
+        }
+        apply_readiness_to_tree(payload, {"B": {"status": "FMC", "score": 90}})
+        
+        tree = payload["tree"]
+        assert "readiness" not in tree["nodes"][0]
+        assert tree["nodes"][1]["readiness"]["status"] == "FMC"
+        assert tree["roots"][0]["children"][0]["readiness"]["score"] == 90
+    
+    def test_apply_sidc_deep_tree_no_recursion_limit(self):
+        from sap_ds.defense.force_elements import apply_sidc_to_tree
+        
+        root = {"id": "0", "children": []}
+        cur = root
+        for i in range(1, 3000):
+            child = {"id": str(i), "children": []}
+            cur["children"].append(child)
+            cur = child
+        payload = {"tree": {"nodes": [], "roots": [root]}}
+        
+        apply_sidc_to_tree(payload, {"2999": "SFGPU"}, icon_base_url="/icons")
+        
+        assert cur["sidc"] == "SFGPU"
+        assert cur["iconUrl"] == "/icons/SFGPU.svg"
+    
+    def test_apply_attrs_single_pass(self):
+        from sap_ds.defense.force_elements import apply_attrs_to_tree, sidc_icon_urls
+        
+        payload = {
+            "tree": {
+                "nodes": [{"id": "A", "children": []}],
+                "roots": [{"id": "A", "children": []}],
+            }
+        }
+        sidcs = {"A": "SFGPU"}
+        apply_attrs_to_tree(payload, {
+            "readiness": {"A": {"status": "PMC", "score": 70}},
+            "sidc": sidcs,
+            "iconUrl": sidc_icon_urls(sidcs, icon_base_url="/icons"),
+            "unused": {},
+        })
+        
+        for node in (payload["tree"]["nodes"][0], payload["tree"]["roots"][0]):
+            assert node["readiness"]["status"] == "PMC"
+            assert node["sidc"] == "SFGPU"
+            assert node["iconUrl"] == "/icons/SFGPU.svg"
+            assert "unused" not in node
+    
+    def test_index_tree_maps_flat_and_nested(self):
+        from sap_ds.defense.force_elements import index_tree
+        
+        flat_b = {"id": "B", "children": []}
+        nested_b = {"id": "B", "children": []}
+        payload = {
+            "tree": {
+                "nodes": [{"id": "A", "children": ["B"]}, flat_b],
+                "roots": [{"id": "A", "children": [nested_b]}],
+            }
+        }
+        idx = index_tree(payload)
+        
+        assert set(idx) == {"A", "B"}
+        assert len(idx["B"]) == 2
+        assert any(n is flat_b for n in idx["B"])
+        assert any(n is nested_b for n in idx["B"])
+
+
+class TestHierarchyTraversal:
+    """Tests for hierarchy traversal via the TP entity."""
+    
+    def test_traverse_reuses_cached_children(self, mock_session, monkeypatch):
+        from sap_ds.defense.force_elements import invalidate_children_cache
+        from sap_ds.defense.force_elements.hierarchy import traverse_hierarchy
+        
+        # Count buffered get() calls even when ijson would stream the reads
+        monkeypatch.setattr("sap_ds.odata.service.ijson", None)
+        
+        rows_by_parent = {
+            "R": [{"ForceElementOrgID": "C1", "FrcElmntOrgStrucParentID": "R"}],
+            "C1": [],
+        }
+        
+        def fake_get(service, entity_set, params=None, sap_client=None):
+            flt = params["$filter"]
+            if flt.startswith("(ForceElementOrgID eq"):
+                return {"d": {"results": [{"ForceElementOrgID": "R"}]}}
+            rows = [r for pid, kids in rows_by_parent.items()
+                    if f"'{pid}'" in flt for r in kids]
+            return {"d": {"results": rows}}
+        
+        mock_session.get = Mock(side_effect=fake_get)
+        invalidate_children_cache()
+        
+        first = traverse_hierarchy(mock_session, "R", max_depth=3, cache_ttl=60)
+        calls_first = mock_session.get.call_count
+        second = traverse_hierarchy(mock_session, "R", max_depth=3, cache_ttl=60)
+        
+        assert set(first) == set(second) == {"R", "C1"}
+        # Only the root lookup is repeated; children come from cache
+        assert mock_session.get.call_count == calls_first + 1
+        
+        invalidate_children_cache(["R"])
+        traverse_hierarchy(mock_session, "R", max_depth=3, cache_ttl=60)
+        assert mock_session.get.call_count == calls_first + 3
+        
+        # Without cache_ttl every traversal re-reads children
+        traverse_hierarchy(mock_session, "R", max_depth=3)
+        assert mock_session.get.call_count == calls_first + 6
+    
+    def test_children_cache_expires_and_is_bounded(self, monkeypatch):
+        from sap_ds.defense.force_elements import hierarchy
+        
+        hierarchy.invalidate_children_cache()
+        monkeypatch.setattr(hierarchy, "CHILDREN_CACHE_MAX", 2)
+        
+        with hierarchy._children_cache_lock:
+            for i, pid in enumerate(["a", "b", "c"]):
+                hierarchy._cache_children(("u", "", "structure", pid), float(i), [])
+            assert [k[3] for k in hierarchy._children_cache] == ["b", "c"]
+            
+            assert hierarchy._cached_children(("u", "", "structure", "b"), 5.0, ttl=10) == []
+            assert hierarchy._cached_children(("u", "", "structure", "c"), 20.0, ttl=10) is None
+            assert [k[3] for k in hierarchy._children_cache] == ["b"]
+        hierarchy.invalidate_children_cache()
+
+
+class TestReadinessHelpers:
+    """Tests for readiness KPI normalization."""
+    
+    def test_to_int_pct(self):
+        from sap_ds.defense.force_elements.readiness import _to_int_pct
+        
+        assert _to_int_pct(None) is None
+        assert _to_int_pct(85) == 85
+        assert _to_int_pct(-5) == 0
+        assert _to_int_pct(150) == 100
+        assert _to_int_pct(" 42 ") == 42
+        assert _to_int_pct("") is None
+        assert _to_int_pct("n/a") is None
+        assert _to_int_pct(77.9) == 77
+        assert _to_int_pct(float("inf")) is None
+        assert _to_int_pct("inf") is None
+    
+    def test_score_to_status_thresholds(self):
+        from sap_ds.defense.force_elements.readiness import _score_to_status
+        
+        assert _score_to_status(0) == "NMC"
+        assert _score_to_status(59) == "NMC"
+        assert _score_to_status(60) == "PMC"
+        assert _score_to_status(84) == "PMC"
+        assert _score_to_status(85) == "FMC"
+        assert _score_to_status(100) == "FMC"
+
+
+class TestFetcherUtils:
+    """Tests for shared bulk-fetcher helpers."""
+    
+    def test_norm_ids_dedups_and_keeps_order(self):
+        from sap_ds.defense.force_elements.utils import norm_ids
+        
+        assert norm_ids([" B", "A", "B ", "", "  ", 7, "A"]) == ["B", "A", "7"]
+    
+    def test_filter_or_escapes_values(self):
+        from sap_ds.defense.force_elements.utils import filter_or
+        
+        assert filter_or("ID", ["1", "O'Neil"]) == "ID eq '1' or ID eq 'O''Neil'"
+        assert filter_or("ID", []) == ""
+    
+    def test_large_id_list_fetches_all_once(self, mock_session):
+        from sap_ds.defense.force_elements.labels import fetch_names_for_ids
+        
+        mock_session.get = Mock(return_value={"d": {"results": [
+            {"ForceElementOrgID": "1", "FrcElmntOrgName": "Alpha"},
+            {"ForceElementOrgID": "99", "FrcElmntOrgName": "Other"},
+        ]}})
+        
+        out = fetch_names_for_ids(mock_session, ["1", "2", "3"], fetch_all_threshold=2)
+        
+        assert out == {"1": "Alpha", "2": "2", "3": "3"}
+        mock_session.get.assert_called_once()
+        params = mock_session.get.call_args.kwargs["params"]
+        assert "$filter" not in params
+    
+    def test_fetch_all_respects_active_only_and_rereads_truncated(self, monkeypatch):
+        from sap_ds.defense.force_elements import utils
+        
+        monkeypatch.setattr(utils, "FETCH_ALL_TOP", 2)
+        svc = Mock()
+        svc.read_all_iter = Mock(return_value=iter([
+            {"ForceElementOrgID": "1"},
+            {"ForceElementOrgID": "99"},
+        ]))
+        svc.stream_read = Mock(return_value=iter([{"ForceElementOrgID": "3"}]))
+        
+        rows = list(utils.iter_rows_for_ids(
+            svc, ["1", "2", "3"], select="ForceElementOrgID",
+            active_only=True, fetch_all_threshold=2,
+        ))
+        
+        assert [r["ForceElementOrgID"] for r in rows] == ["1", "3"]
+        assert svc.read_all_iter.call_args.kwargs["$filter"] == "IsActiveEntity eq true"
+        flt = svc.stream_read.call_args.kwargs["$filter"]
+        assert "'2'" in flt and "'3'" in flt and "'1'" not in flt
+        assert flt.endswith("and (IsActiveEntity eq true)")
+    
+    def test_chunk_failing_mid_stream_is_skipped(self):
+        from sap_ds.core.session import ODataUpstreamError
+        from sap_ds.defense.force_elements.utils import iter_rows_for_ids
+        
+        def truncated():
+            yield {"ForceElementOrgID": "1"}
+            raise ODataUpstreamError(200, "Invalid or truncated JSON", "url")
+        
+        svc = Mock()
+        svc.stream_read = Mock(side_effect=[
+            truncated(),
+            iter([{"ForceElementOrgID": "3"}]),
+        ])
+        
+        rows = list(iter_rows_for_ids(
+            svc, ["1", "2", "3"], select="ForceElementOrgID", chunk_size=2,
+        ))
+        
+        assert [r["ForceElementOrgID"] for r in rows] == ["3"]
+        assert svc.stream_read.call_count == 2
+
+
+class TestSidcDiscovery:
+    """Tests for SIDC field discovery."""
+    
+    def test_probe_uses_metadata_not_reads(self, mock_session, monkeypatch):
+        from sap_ds.defense.force_elements import symbol
+        
+        monkeypatch.setattr(symbol, "_SIDC_FIELD", None)
+        monkeypatch.setattr(symbol, "_SIDC_PROBE_COMPLETE", False)
+        mock_session.get = Mock()
+        mock_session.get_text = Mock(return_value="""<?xml version="1.0"?>
+            <edmx:Edmx xmlns:edmx="http://schemas.microsoft.com/ado/2007/06/edmx">
+                <edmx:DataServices>
+                    <Schema xmlns="http://schemas.microsoft.com/ado/2008/09/edm">
+                        <EntityType Name="C_FrcElmntOrgTPType">
+                            <Property Name="ForceElementOrgID" Type="Edm.String"/>
+                            <Property Name="FrcElmntOrgMilSymbCode" Type="Edm.String"/>
+                        </EntityType>
+                        <EntityContainer>
+                            <EntitySet Name="C_FrcElmntOrgTP" EntityType="X.C_FrcElmntOrgTPType"/>
+                        </EntityContainer>
+                    </Schema>
+                </edmx:DataServices>
+            </edmx:Edmx>""")
+        
+        assert symbol.get_sidc_field(mock_session) == "FrcElmntOrgMilSymbCode"
+        mock_session.get.assert_not_called()
+    
+    def test_icon_urls_shared_per_sidc(self):
+        from sap_ds.defense.force_elements import sidc_icon_urls
+        
+        urls = sidc_icon_urls({"A": "SFGPU", "B": "SFGPU", "C": "SHGPE"}, icon_base_url="/i")
+        
+        assert urls == {"A": "/i/SFGPU.svg", "B": "/i/SFGPU.svg", "C": "/i/SHGPE.svg"}
+        assert urls["A"] is urls["B"]
+
+
+class TestLabels:
+    """Tests for Force Element name resolution."""
+    
+    def test_fetch_single_fe_direct_and_memoized(self, mock_session):
+        from sap_ds.defense.force_elements import labels
+        
+        labels._SINGLE_NAME_CACHE.clear()
+        mock_session.get = Mock(return_value={
+            "d": {"results": [{"ForceElementOrgID": "50000027", "FrcElmntOrgName": "HQ"}]}
+        })
+        
+        first = labels.fetch_single_fe(mock_session, "50000027", host="s4.example.com")
+        second = labels.fetch_single_fe(mock_session, " 50000027 ", host="s4.example.com")
+        
+        assert first["name"] == second["name"] == "HQ"
+        assert mock_session.get.call_count == 1
+        params = mock_session.get.call_args.kwargs["params"]
+        assert params["$top"] == "1"
+        assert params["$filter"] == "ForceElementOrgID eq '50000027'"
+    
+    def test_fetch_single_fe_falls_back_to_id(self, mock_session):
+        from sap_ds.defense.force_elements import labels
+        
+        labels._SINGLE_NAME_CACHE.clear()
+        mock_session.get = Mock(return_value={"d": {"results": []}})
+        
+        info = labels.fetch_single_fe(mock_session, "X1")
+        
+        assert info["name"] == "X1"
+        assert not labels._SINGLE_NAME_CACHE
+    
+    def test_single_name_cache_expires_and_invalidates(self, mock_session, monkeypatch):
+        from sap_ds.defense.force_elements import labels
+        
+        labels._SINGLE_NAME_CACHE.clear()
+        mock_session.get = Mock(return_value={
+            "d": {"results": [{"ForceElementOrgID": "7", "FrcElmntOrgName": "Bravo"}]}
+        })
+        
+        labels.fetch_single_fe(mock_session, "7")
+        labels.invalidate_single_name_cache(["7"])
+        labels.fetch_single_fe(mock_session, "7")
+        assert mock_session.get.call_count == 2
+        
+        monkeypatch.setattr(labels, "SINGLE_NAME_CACHE_TTL", 0.0)
+        labels.fetch_single_fe(mock_session, "7")
+        assert mock_session.get.call_count == 3
+        
+        monkeypatch.setattr(labels, "SINGLE_NAME_CACHE_MAX", 1)
+        mock_session.get.return_value = {"d": {"results": [{"ForceElementOrgID": "8"}]}}
+        labels.fetch_single_fe(mock_session, "8")
+        assert len(labels._SINGLE_NAME_CACHE) == 1
@@ -2,11 +2,15 @@
 Tests for sap_ds.odata module.
 """
 
+import json
+
 import pytest
 from unittest.mock import Mock, patch
 
-from sap_ds.odata.service import ODataService, escape_odata_literal, _join_csv
-from sap_ds.odata.metadata import ODataMetadata, EntitySetInfo, _strip_ns
+from sap_ds.odata.service import (
+    ODataService, escape_odata_literal, _join_csv, _next_link_key
+)
+from sap_ds.odata.metadata import ODataMetadata, EntitySetInfo
 
 
 class TestHelperFunctions:
@@ -16,6 +20,14 @@ class TestHelperFunctions:
         assert escape_odata_literal("simple") == "simple"
         assert escape_odata_literal("O'Brien") == "O''Brien"
         assert escape_odata_literal("test''double") == "test''''double"
+
+    def test_escape_odata_literal_is_memoized(self):
+        escape_odata_literal.cache_clear()
+        escape_odata_literal("FE-1")
+        escape_odata_literal("FE-1")
+        info = escape_odata_literal.cache_info()
+        assert (info.hits, info.misses) == (1, 1)
+        assert info.maxsize >= 4096
     
     def test_join_csv(self):
         assert _join_csv(["a", "b", "c"]) == "a,b,c"
@@ -23,9 +35,12 @@ class TestHelperFunctions:
         assert _join_csv(["a", "", "c"]) == "a,c"
         assert _join_csv([]) == ""
     
-    def test_strip_ns(self):
-        assert _strip_ns("{http://example.com}Tag") == "Tag"
-        assert _strip_ns("Tag") == "Tag"
+    def test_next_link_key_uses_cursor(self):
+        a = "https://h/S/E?$skiptoken=40&$filter=x&sap-client=100"
+        b = "https://h/S/E?sap-client=100&$filter=x&$skiptoken=40"
+        assert _next_link_key(a) == _next_link_key(b) == ("/S/E", "40")
+        assert _next_link_key("https://h/S/E?$skip=20") == ("/S/E", "20")
+        assert _next_link_key("https://h/S/E?$top=5") == "https://h/S/E?$top=5"
 
 
 class TestODataMetadata:
@@ -63,6 +78,77 @@ class TestODataMetadata:
         assert "Name" in valid
         assert "InvalidField" in unknown
 
+    def test_validate_select_memoized_and_reset_on_refresh(
+        self, mock_session, sample_metadata_xml
+    ):
+        mock_session.get_text = Mock(return_value=sample_metadata_xml)
+        meta = ODataMetadata(mock_session, "TestService")
+
+        valid, _ = meta.validate_select("TestEntities", ["ID", "Bogus"])
+        valid.append("mutated")
+        assert meta.validate_select("TestEntities", ["ID", "Bogus"]) == (["ID"], ["Bogus"])
+
+        mock_session.get_text = Mock(return_value=sample_metadata_xml.replace(
+            'Name="Status"', 'Name="Bogus"'
+        ))
+        meta.refresh()
+        assert meta.validate_select("TestEntities", ["ID", "Bogus"]) == (["ID", "Bogus"], [])
+
+    def test_parse_v4_namespace_container_first(self, mock_session):
+        mock_session.get_text = Mock(return_value="""<?xml version="1.0"?>
+            <edmx:Edmx xmlns:edmx="http://docs.oasis-open.org/odata/ns/edmx" Version="4.0">
+                <edmx:DataServices>
+                    <Schema xmlns="http://docs.oasis-open.org/odata/ns/edm" Namespace="C">
+                        <EntityContainer Name="Container">
+                            <EntitySet Name="Orders" EntityType="T.Order"/>
+                        </EntityContainer>
+                    </Schema>
+                    <Schema xmlns="http://docs.oasis-open.org/odata/ns/edm" Namespace="T">
+                        <EntityType Name="Order">
+                            <Property Name="OrderID" Type="Edm.String"/>
+                            <NavigationProperty Name="Items" Type="Collection(T.Item)"/>
+                        </EntityType>
+                    </Schema>
+                </edmx:DataServices>
+            </edmx:Edmx>""")
+
+        meta = ODataMetadata(mock_session, "TestService")
+
+        assert meta.properties("Orders") == ["OrderID"]
+
+    def test_disk_cache_revalidates_with_etag(
+        self, mock_session, sample_metadata_xml, tmp_path
+    ):
+        mock_session.get_text_conditional = Mock(
+            return_value=(sample_metadata_xml, {"ETag": 'W/"v1"'})
+        )
+        ODataMetadata(mock_session, "TestService", cache_dir=str(tmp_path)).refresh()
+        assert [p.suffix for p in tmp_path.iterdir()] == [".json"]
+
+        mock_session.get_text_conditional = Mock(return_value=(None, {}))
+        meta = ODataMetadata(mock_session, "TestService", cache_dir=str(tmp_path))
+
+        assert "Name" in meta.properties("TestEntities")
+        kwargs = mock_session.get_text_conditional.call_args.kwargs
+        assert kwargs["etag"] == 'W/"v1"'
+
+    @pytest.mark.parametrize("doc", [
+        ["not", "a", "dict"],
+        {"etag": 'W/"v1"', "entity_sets": [{"bogus": 1}]},
+        {"etag": 'W/"v1"', "entity_sets": ["TestEntities"]},
+    ])
+    def test_malformed_disk_cache_falls_back_to_fetch(
+        self, mock_session, sample_metadata_xml, tmp_path, doc
+    ):
+        meta = ODataMetadata(mock_session, "TestService", cache_dir=str(tmp_path))
+        meta._cache_path.parent.mkdir(parents=True, exist_ok=True)
+        meta._cache_path.write_text(json.dumps(doc), encoding="utf-8")
+        mock_session.get_text_conditional = Mock(return_value=(None, {}))
+        mock_session.get_text = Mock(return_value=sample_metadata_xml)
+
+        assert "Name" in meta.properties("TestEntities")
+        mock_session.get_text.assert_called_once()
+
 
 class TestODataService:
     """Tests for ODataService."""
@@ -76,6 +162,18 @@ class TestODataService:
         assert len(results) == 2
         assert results[0]["ID"] == "001"
     
+    def test_stream_read_without_ijson_falls_back_to_read(
+        self, mock_session, sample_odata_response
+    ):
+        mock_session.get = Mock(return_value=sample_odata_response)
+        
+        svc = ODataService(mock_session, "TestService")
+        with patch("sap_ds.odata.service.ijson", None):
+            rows = svc.stream_read("TestEntities", **{"$top": "2"})
+        
+        assert mock_session.get.call_count == 1
+        assert [r["ID"] for r in rows] == ["001", "002"]
+    
     def test_read_all_follows_paging(self, mock_session):
         page1 = {
             "d": {
@@ -100,7 +198,150 @@ class TestODataService:
         results = svc.read_all("TestEntities")
         
         assert len(results) == 2
+
+    def test_read_all_iter_is_lazy(self, mock_session, sample_odata_response):
+        mock_session.get = Mock(return_value=sample_odata_response)
+        
+        svc = ODataService(mock_session, "TestService")
+        rows = svc.read_all_iter("TestEntities")
+        mock_session.get.assert_not_called()
+        
+        assert [r["ID"] for r in rows] == ["001", "002"]
+        assert svc.read_all("TestEntities") == sample_odata_response["d"]["results"]
+    
+    def test_services_share_parsed_metadata(self, mock_session, sample_metadata_xml):
+        mock_session.get_text = Mock(return_value=sample_metadata_xml)
+
+        first = ODataService(mock_session, "TestService")
+        second = ODataService(mock_session, "TestService")
+
+        assert first.meta is second.meta
+        assert "ID" in first.list_fields("TestEntities")
+        assert "ID" in second.list_fields("TestEntities")
+        mock_session.get_text.assert_called_once()
+
+    def test_shared_metadata_refreshes_after_ttl_on_caller_session(
+        self, mock_session, sample_metadata_xml, monkeypatch
+    ):
+        from sap_ds.odata import metadata as metadata_mod
+        
+        mock_session._auth_id = Mock(return_value="user")
+        mock_session.get_text = Mock(return_value=sample_metadata_xml)
+        other = Mock(base=mock_session.base, cfg=mock_session.cfg)
+        other._auth_id = Mock(return_value="user")
+        other.get_text_conditional = Mock(return_value=(sample_metadata_xml.replace(
+            'Name="Status"', 'Name="Added"'
+        ), {}))
+        clock = [1000.0]
+        monkeypatch.setattr(metadata_mod.time, "monotonic", lambda: clock[0])
+        
+        first = ODataService(mock_session, "TestService", meta_ttl=60)
+        assert "Added" not in first.list_fields("TestEntities")
+        
+        second = ODataService(other, "TestService")
+        assert second.meta is first.meta
+        
+        clock[0] += 61
+        assert "Added" in second.list_fields("TestEntities")
+        other.get_text_conditional.assert_called_once()
+        mock_session.get_text.assert_called_once()
+    
+    def test_ttl_refresh_not_modified_reuses_parse(
+        self, mock_session, sample_metadata_xml, monkeypatch
+    ):
+        from sap_ds.odata import metadata as metadata_mod
+        
+        clock = [1000.0]
+        monkeypatch.setattr(metadata_mod.time, "monotonic", lambda: clock[0])
+        mock_session.get_text_conditional = Mock(side_effect=[
+            (sample_metadata_xml, {"ETag": 'W/"v1"'}),
+            (None, {}),
+        ])
+        meta = ODataMetadata(mock_session, "TestService", ttl=60)
+        meta.entity_sets()
+        
+        clock[0] += 61
+        with patch.object(meta, "_parse") as parse:
+            assert "TestEntities" in meta.entity_sets()
+        
+        parse.assert_not_called()
+        assert mock_session.get_text_conditional.call_args.kwargs["etag"] == 'W/"v1"'
+        assert meta._loaded_at == clock[0]
+    
+    def test_shared_metadata_keyed_by_credentials(self, mock_session, sample_metadata_xml):
+        mock_session._auth_id = Mock(return_value="alice")
+        other = Mock(base=mock_session.base, cfg=mock_session.cfg)
+        other._auth_id = Mock(return_value="bob")
+        
+        assert ODataService(mock_session, "TestService").meta is not (
+            ODataService(other, "TestService").meta
+        )
+    
+    def test_shared_metadata_is_bounded_and_holds_session_weakly(
+        self, mock_session, monkeypatch
+    ):
+        import gc
+        from sap_ds.odata import metadata as metadata_mod
+        
+        monkeypatch.setattr(metadata_mod, "_META_CACHE_MAX", 2)
+        mock_session._auth_id = Mock(return_value="user")
+        sess = Mock(base=mock_session.base, cfg=mock_session.cfg)
+        sess._auth_id = Mock(return_value="user")
+        
+        meta = ODataMetadata.get(sess, "Svc0")
+        for name in ("Svc1", "Svc2"):
+            ODataMetadata.get(mock_session, name)
+        assert list(k[1] for k in metadata_mod._META_CACHE) == ["Svc1", "Svc2"]
+        
+        del sess
+        gc.collect()
+        assert meta.sess is None
+        with pytest.raises(ValueError):
+            meta.refresh()
     
+    def test_concurrent_first_access_fetches_once(self, mock_session, sample_metadata_xml):
+        import threading
+        import time
+        
+        def slow_get_text(*args, **kwargs):
+            time.sleep(0.05)
+            return sample_metadata_xml
+        
+        mock_session.get_text = Mock(side_effect=slow_get_text)
+        meta = ODataMetadata(mock_session, "TestService")
+        threads = [
+            threading.Thread(target=meta.entity_sets, kwargs={"sess": mock_session})
+            for _ in range(4)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        
+        mock_session.get_text.assert_called_once()
+    
+    def test_iterate_prefetch_yields_pages_in_order(self, mock_session):
+        def page(n, nxt):
+            r = Mock()
+            r.json.return_value = {"d": {"results": [{"ID": n}], "__next": nxt}}
+            return r
+
+        pages = {
+            "https://test.com/p2": page("002", "https://test.com/p3"),
+            "https://test.com/p3": page("003", None),
+        }
+        mock_session.get = Mock(return_value={
+            "d": {"results": [{"ID": "001"}], "__next": "https://test.com/p2"}
+        })
+        mock_session.session.get = Mock(side_effect=lambda url, **kw: pages[url])
+        mock_session._raise_for_error = Mock()
+
+        svc = ODataService(mock_session, "TestService")
+        ids = [r["ID"] for pg in svc.iterate("TestEntities", prefetch=True) for r in pg]
+
+        assert ids == ["001", "002", "003"]
+        assert mock_session.session.get.call_count == 2
+
     def test_query_builds_params(self, mock_session, sample_odata_response):
         mock_session.get = Mock(return_value=sample_odata_response)
         mock_session.get_text = Mock(return_value="""<?xml version="1.0"?>